@@ -0,0 +1,168 @@
+"""
+Slow-client concurrency: gunicorn sync workers (src/wsgi.py) against
+uvicorn (src/asgi.py), with the same number of processes.
+
+While --slow-clients connections trickle in their request headers over
+--hold seconds, --fast-clients keep requesting --path as fast as they can.
+A sync worker is stuck on each slow client until its request is complete,
+so fast clients queue behind them; an async worker keeps serving.
+
+    python benchmarks/bench_concurrency.py --scale 1k --workers 2 --slow-clients 1000
+
+Writes fast-client latency/throughput and slow-client completions per
+server as JSON (benchmarks/results/<commit>_concurrency.json by default).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import seed as seeding
+from run import ROOT, RESULTS_DIR, free_port, git_commit, summarize
+
+SERVERS = {
+    'gunicorn-sync': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', os.path.join(ROOT, 'src'),
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning'],
+    'uvicorn-asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--app-dir', os.path.join(ROOT, 'src'),
+        '--port', str(port), '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+}
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length, keep_alive = 0, True
+    for line in head.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+        elif name.lower() == b'connection' and value.strip().lower() == b'close':
+            # gunicorn's sync workers close the connection after every response
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def wait_ready(port, deadline):
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /planets/1 HTTP/1.1\r\nHost: bench\r\n\r\n')
+            await read_response(reader)
+            writer.close()
+            return
+        except (OSError, asyncio.IncompleteReadError):
+            await asyncio.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+async def slow_client(port, path, hold, timeout, outcome):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\n'.encode())
+        await writer.drain()
+        # The rest of the headers, one at a time across the hold period
+        for index in range(5):
+            await asyncio.sleep(hold / 5)
+            writer.write(f'X-Slow-{index}: 1\r\n'.encode())
+            await writer.drain()
+        writer.write(b'\r\n')
+        await asyncio.wait_for(read_response(reader), timeout)
+        writer.close()
+        outcome['completed'] += 1
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        outcome['failed'] += 1
+
+
+async def fast_client(port, path, until, timeout, latencies, statuses):
+    reader = writer = None
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode())
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            status = 'error'
+        latencies.append(time.perf_counter() - start)
+        statuses.append(status)
+
+
+async def measure(port, args):
+    await wait_ready(port, time.monotonic() + 30)
+    outcome = {'completed': 0, 'failed': 0}
+    slow = [asyncio.create_task(slow_client(port, args.path, args.hold, args.timeout, outcome))
+            for _ in range(args.slow_clients)]
+    # Let the slow clients occupy the server before measuring
+    await asyncio.sleep(min(1, args.hold / 5))
+
+    latencies, statuses = [], []
+    start = time.perf_counter()
+    until = time.monotonic() + args.duration
+    await asyncio.gather(*(fast_client(port, args.path, until, args.timeout, latencies, statuses)
+                           for _ in range(args.fast_clients)))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*slow)
+    return {**summarize(latencies, statuses, elapsed, {}), 'slow_clients': outcome}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=seeding.parse_scale, default='1k')
+    parser.add_argument('--database')
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--path', default='/planets?limit=20')
+    parser.add_argument('--slow-clients', type=int, default=1000)
+    parser.add_argument('--hold', type=float, default=5, help='Seconds a slow client takes to send its request')
+    parser.add_argument('--fast-clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=5, help='Seconds of fast-client load')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    database = args.database or seeding.default_database(args.scale)
+    if not os.path.exists(database):
+        seeding.seed(database, args.scale, 1000, log=lambda line: print(line, file=sys.stderr))
+
+    commit = git_commit()
+    report = {'meta': {'commit': commit, 'scale': args.scale, 'workers': args.workers, 'path': args.path,
+                       'slow_clients': args.slow_clients, 'hold': args.hold, 'fast_clients': args.fast_clients,
+                       'duration': args.duration},
+              'results': {}}
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}', 'LOG_LEVEL': 'WARNING'}
+    for name in args.servers.split(','):
+        port = free_port()
+        process = subprocess.Popen(SERVERS[name](port, args.workers), env=env)
+        try:
+            stats = report['results'][name] = asyncio.run(measure(port, args))
+        except RuntimeError as error:
+            print(f'Skipping {name}: {error}', file=sys.stderr)
+            continue
+        finally:
+            process.terminate()
+            process.wait(timeout=15)
+        print(f'{name:<14} fast p50 {stats["p50_ms"]} ms  p99 {stats["p99_ms"]} ms  '
+              f'{stats["throughput_rps"]} req/s  {stats["statuses"]}  slow {stats["slow_clients"]}', file=sys.stderr)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{(commit or "unknown")[:10]}_concurrency.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
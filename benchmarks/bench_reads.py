@@ -0,0 +1,83 @@
+"""
+ORM instances against the Core read path (API_CORE_READS) on the catalog
+list and detail routes.
+
+Each setting runs in its own process, through the Flask test client with
+the response cache off. CPU is process time per request and per returned
+row; memory is the tracemalloc peak of one request.
+
+    python benchmarks/bench_reads.py [--scale 1k] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import seed as seeding
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+PATHS = {
+    'list page (500 rows)': ('/planets?limit=500', 500),
+    'list page, ?fields= (500 rows)': ('/planets?limit=500&fields=id,name,population', 500),
+    'stream whole table': ('/vehicles?stream=1', None),
+    'detail': ('/characters/7', 1),
+}
+
+
+def measure(repeat):
+    sys.path.insert(0, SRC)
+    from app import app
+    client = app.test_client()
+    report = {}
+    for name, (path, rows) in PATHS.items():
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        rows = rows or len(json.loads(response.get_data())['results'])
+        start = time.process_time()
+        for _ in range(repeat):
+            client.get(path).get_data()
+        cpu = (time.process_time() - start) / repeat
+        tracemalloc.start()
+        client.get(path).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report[name] = {'rows': rows, 'cpu_ms': round(cpu * 1000, 3),
+                        'cpu_us_per_row': round(cpu * 1e6 / rows, 2), 'peak_kib': round(peak / 1024)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=seeding.parse_scale, default='1k')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.repeat)))
+        return
+
+    database = seeding.default_database(args.scale)
+    if not os.path.exists(database):
+        seeding.seed(database, args.scale, 1000, log=lambda line: print(line, file=sys.stderr))
+    report = {}
+    for setting, flag in (('orm', '0'), ('core', '1')):
+        env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}', 'LOG_LEVEL': 'WARNING',
+               'RESPONSE_CACHE_SIZE': '0', 'API_CORE_READS': flag}
+        out = subprocess.run([sys.executable, __file__, '--measure', '--repeat', str(args.repeat)],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        report[setting] = json.loads(out)
+
+    for name in PATHS:
+        orm, core = report['orm'][name], report['core'][name]
+        print(f'{name:<32} cpu/row {orm["cpu_us_per_row"]:>8} -> {core["cpu_us_per_row"]:>8} us   '
+              f'peak {orm["peak_kib"]:>6} -> {core["peak_kib"]:>6} KiB', file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Serialization benchmark: encodes a 10k-row vehicle list the old way
+(ORM objects -> serialize() -> stdlib JSON provider) and with the compiled
+serializers + orjson provider.
+
+    python benchmarks/bench_serialization.py [--rows 10000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+    sys.path.insert(0, SRC)
+    from flask.json.provider import DefaultJSONProvider
+    from sqlalchemy import insert, select
+    from app import app
+    from fields import select_columns
+    from models import db, Vehicle
+    from serializers import serialize_objects, serialize_tuples
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.execute(insert(Vehicle), [
+            {'name': f'Vehicle {i}', 'model': f'Model {i % 97}', 'manufacturer': f'Maker {i % 13}',
+             'passengers': i % 50, 'max_speed': i % 1200}
+            for i in range(args.rows)
+        ])
+        db.session.commit()
+
+        stdlib = DefaultJSONProvider(app)
+        fast = app.json
+        fields = list(Vehicle.public_fields)
+
+        def baseline():
+            db.session.expunge_all()
+            items = Vehicle.query.order_by(Vehicle.id).all()
+            return stdlib.response({'msg': 'ok', 'results': [item.serialize() for item in items]}).get_data()
+
+        def compiled_objects():
+            db.session.expunge_all()
+            items = Vehicle.query.order_by(Vehicle.id).all()
+            return fast.response({'msg': 'ok', 'results': serialize_objects(Vehicle, items)}).get_data()
+
+        def compiled_rows():
+            rows = db.session.execute(select(*select_columns(Vehicle, fields)).order_by(Vehicle.id)).all()
+            return fast.response({'msg': 'ok', 'results': serialize_tuples(Vehicle, rows, fields)}).get_data()
+
+        def encode_only_stdlib(results=[item.serialize() for item in Vehicle.query.all()]):
+            return stdlib.response({'msg': 'ok', 'results': results}).get_data()
+
+        def encode_only_fast(results=[item.serialize() for item in Vehicle.query.all()]):
+            return fast.response({'msg': 'ok', 'results': results}).get_data()
+
+        print(f'{args.rows} rows, JSON provider: {type(fast).__name__}, mean of {args.repeat} runs')
+        cases = [
+            ('encode only, stdlib provider', encode_only_stdlib),
+            ('encode only, app provider', encode_only_fast),
+            ('ORM + serialize() + stdlib (before)', baseline),
+            ('ORM + compiled serializer + app provider', compiled_objects),
+            ('row tuples + compiled serializer + app provider', compiled_rows),
+        ]
+        reference = None
+        for name, fn in cases:
+            ms = timed(fn, args.repeat)
+            if fn is baseline:
+                reference = ms
+            speedup = f'  ({reference / ms:.1f}x vs before)' if reference and fn is not baseline else ''
+            print(f'  {name:<50} {ms:8.2f} ms{speedup}')
+
+    os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
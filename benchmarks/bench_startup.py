@@ -0,0 +1,122 @@
+"""
+App import time and gunicorn per-worker memory.
+
+Compares the bare start command (`gunicorn wsgi --chdir src`, no preload,
+admin mounted) with gunicorn.conf.py (preload, ENABLE_ADMIN=0), using the
+same number of workers. RSS counts pages shared with the master, so PSS
+(shared pages split between processes) and USS (pages only this worker
+has) are reported too.
+
+    python benchmarks/bench_startup.py [--workers 3] [--root OTHER_CHECKOUT]
+
+--root points at another checkout (e.g. a `git worktree` of an older
+commit) to measure that tree instead.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import seed as seeding
+from run import ROOT, free_port
+
+IMPORT_APP = 'import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)'
+
+
+def import_time(root, env, repeat):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', IMPORT_APP], cwd=os.path.join(root, 'src'), env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss_mb': round(values.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(values.get('Pss', 0) / 1024, 1),
+        'uss_mb': round((values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return [int(child) for child in file.read().split()]
+
+
+def worker_memory(command, root, env, workers, warmup):
+    port = free_port()
+    process = subprocess.Popen(command + ['--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+                               cwd=root, env=env)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/planets/1').read()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+        started = time.monotonic()
+        # Touch every worker's code paths a few times before measuring
+        for index in range(warmup):
+            for path in ('/planets', '/characters?fields=id,name', '/vehicles/1', f'/users/{index % 5 + 1}/favorites'):
+                urllib.request.urlopen(f'http://127.0.0.1:{port}{path}').read()
+        pids = children(process.pid)
+        per_worker = [memory_kb(pid) for pid in pids]
+        total = {key: round(sum(worker[key] for worker in per_worker), 1) for key in per_worker[0]}
+        return {'workers': len(pids), 'master': memory_kb(process.pid), 'per_worker_mean': {
+            key: round(value / len(pids), 1) for key, value in total.items()}, 'workers_total': total,
+            'warmup_seconds': round(time.monotonic() - started, 2)}
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default=ROOT)
+    parser.add_argument('--scale', type=seeding.parse_scale, default='1k')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5, help='Import time samples')
+    parser.add_argument('--warmup', type=int, default=50, help='Request rounds before measuring memory')
+    args = parser.parse_args()
+
+    database = seeding.default_database(args.scale)
+    if not os.path.exists(database):
+        seeding.seed(database, args.scale, 1000, log=lambda line: print(line, file=sys.stderr))
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}', 'LOG_LEVEL': 'WARNING'}
+    setups = {
+        'defaults': ([sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', './src/'], {'ENABLE_ADMIN': '1'}),
+    }
+    if os.path.exists(os.path.join(args.root, 'gunicorn.conf.py')):
+        setups['gunicorn.conf.py'] = ([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'wsgi'],
+                                      {'ENABLE_ADMIN': '0'})
+
+    report = {}
+    for name, (command, extra_env) in setups.items():
+        setup_env = {**env, **extra_env}
+        report[name] = {
+            'env': extra_env,
+            'import_ms': import_time(args.root, setup_env, args.repeat),
+            **worker_memory(command, args.root, setup_env, args.workers, args.warmup),
+        }
+        print(f'{name:<18} import {report[name]["import_ms"]} ms  per worker {report[name]["per_worker_mean"]}',
+              file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Compares two benchmarks/run.py result files endpoint by endpoint.
+
+    python benchmarks/compare.py results/OLD.json results/NEW.json [--metric p95_ms]
+
+Negative latency changes and positive throughput changes are improvements.
+"""
+import argparse
+import json
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'peak_rss_mb')
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return ''
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--metric', choices=METRICS, action='append',
+                        help='Metric to compare, may be repeated (default: p50, p99, throughput)')
+    args = parser.parse_args()
+    metrics = args.metric or ['p50_ms', 'p99_ms', 'throughput_rps']
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+    print(f'old: {old["meta"]["commit"]}  scale {old["meta"]["scale"]}')
+    print(f'new: {new["meta"]["commit"]}  scale {new["meta"]["scale"]}')
+
+    for driver, endpoints in new['results'].items():
+        previous = old['results'].get(driver, {})
+        print(f'\n{driver}')
+        for endpoint, stats in endpoints.items():
+            before = previous.get(endpoint)
+            if before is None:
+                continue
+            columns = [f'{metric} {before[metric]} -> {stats[metric]} {change(before[metric], stats[metric]):>8}'
+                       for metric in metrics]
+            print(f'  {endpoint:<48} ' + '   '.join(columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+"""
+HTTP benchmark for every route in src/app.py.
+
+Seeds (or reuses) a deterministic SQLite database, then drives each
+scenario through the Flask test client in this process and through a real
+gunicorn server, and writes p50/p95/p99 latency, throughput, status counts
+and peak RSS per endpoint as JSON.
+
+    python benchmarks/run.py --scale 100k
+    python benchmarks/run.py --scale 1k --drivers client --requests 50 --only planets
+    python benchmarks/compare.py results/<old>.json results/<new>.json
+
+Peak RSS is the process high-water mark (VmHWM), reset before each
+scenario through /proc/<pid>/clear_refs; where that is not available the
+lifetime peak of the process is reported instead. For gunicorn it is the
+largest worker, and the sum over all workers.
+
+Both drivers inherit the environment, so the app settings under test are
+set as usual (e.g. RESPONSE_CACHE_SIZE=0 to measure uncached handlers);
+the relevant ones are recorded in the report. EXPORT_TOKEN defaults to a
+throwaway value so the /export scenarios can authenticate.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import re
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import seed as seeding
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+RESULTS_DIR = os.path.join(HERE, 'results')
+# Settings that change what is measured, copied into the report
+RECORDED_ENV_PREFIXES = ('API_', 'COMPRESS_', 'BROTLI_', 'DB_', 'RESPONSE_CACHE_', 'SQLITE_')
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None, headers=None):
+        self.name = name
+        self.method = method
+        # path(i, rng) / body(i, rng) -> request for the i-th call
+        self.path = path
+        self.body = body
+        # () -> extra request headers
+        self.headers = headers
+
+    def request(self, index, rng):
+        body = self.body(index, rng) if self.body else None
+        headers = self.headers() if self.headers else {}
+        return self.method, self.path(index, rng), body, headers
+
+
+def scenarios(rows, users):
+    def user_with(favorites):
+        # First user at the requested FAVORITE_LEVELS step
+        level = seeding.FAVORITE_LEVELS.index(favorites)
+        return min(level + 1, users)
+
+    empty_user = user_with(0)
+    busy_user = user_with(1000)
+    # Write scenarios use ids past the ones read scenarios touch and clean
+    # up after themselves (add, then remove the same favorites)
+    write_ids = lambda i, rng: rows - i % rows
+    some_ids = lambda rng, count=20: ','.join(str(rng.randint(1, rows)) for _ in range(count))
+
+    catalog = []
+    for kind, plural, filter_arg, sort_arg in (
+        ('character', 'characters', 'gender=female', 'name'),
+        ('planet', 'planets', 'climate=arid&population_gte=500000000', '-name'),
+        ('vehicle', 'vehicles', 'manufacturer=Incom+Corporation&max_speed_lte=800', 'name'),
+    ):
+        catalog += [
+            Scenario(f'GET /{plural}', 'GET', lambda i, rng, p=plural: f'/{p}'),
+            Scenario(f'GET /{plural}?limit=500', 'GET', lambda i, rng, p=plural: f'/{p}?limit=500'),
+            Scenario(f'GET /{plural}?fields=id,name', 'GET', lambda i, rng, p=plural: f'/{p}?fields=id,name'),
+            Scenario(f'GET /{plural}?filter', 'GET', lambda i, rng, p=plural, f=filter_arg: f'/{p}?{f}'),
+            Scenario(f'GET /{plural}?sort', 'GET', lambda i, rng, p=plural, s=sort_arg: f'/{p}?sort={s}'),
+            Scenario(f'GET /{plural}?q', 'GET',
+                     lambda i, rng, p=plural: f'/{p}?q={rng.choice(seeding.WORDS).lower()}'),
+            Scenario(f'GET /{plural}?count=1', 'GET', lambda i, rng, p=plural: f'/{p}?count=1'),
+            Scenario(f'GET /{plural}?stream=ndjson', 'GET',
+                     lambda i, rng, p=plural: f'/{p}?stream=ndjson&fields=id,name'),
+            Scenario(f'GET /{plural}?ids=', 'GET', lambda i, rng, p=plural: f'/{p}?ids={some_ids(rng)}'),
+            Scenario(f'GET /{plural}/<id>', 'GET', lambda i, rng, p=plural: f'/{p}/{rng.randint(1, rows)}'),
+            Scenario(f'GET /{plural}/popular', 'GET', lambda i, rng, p=plural: f'/{p}/popular'),
+        ]
+
+    favorites = []
+    for kind in ('planet', 'character', 'vehicle'):
+        favorites += [
+            Scenario(f'POST /users/<id>/favorite/{kind}/<id>', 'POST',
+                     lambda i, rng, k=kind: f'/users/{empty_user}/favorite/{k}/{write_ids(i, rng)}'),
+            Scenario(f'DELETE /users/<id>/favorite/{kind}/<id>', 'DELETE',
+                     lambda i, rng, k=kind: f'/users/{empty_user}/favorite/{k}/{write_ids(i, rng)}'),
+        ]
+
+    export_auth = lambda: {'Authorization': f"Bearer {os.environ.get('EXPORT_TOKEN', '')}"}
+    exports = [
+        Scenario(f'GET /export/{table}?format={fmt}', 'GET',
+                 lambda i, rng, t=table, f=fmt: f'/export/{t}?format={f}', headers=export_auth)
+        for table, fmt in (('planet', 'ndjson'), ('planet', 'csv&gzip=1'), ('fav_planet', 'ndjson'))
+    ]
+
+    def batch_body(i, rng):
+        ids = [(i * 10 + n) % rows + 1 for n in range(10)]
+        return {'operations': [{'op': 'add', 'type': 'planet', 'id': target} for target in ids[:5]]
+                + [{'op': 'remove', 'type': 'planet', 'id': target} for target in ids[5:]]}
+
+    return [
+        Scenario('GET /', 'GET', lambda i, rng: '/'),
+        Scenario('GET /cache/stats', 'GET', lambda i, rng: '/cache/stats'),
+        Scenario('GET /users', 'GET', lambda i, rng: '/users'),
+        Scenario('GET /users?limit=500', 'GET', lambda i, rng: '/users?limit=500'),
+        Scenario('GET /users/<id>/favorites (0)', 'GET', lambda i, rng: f'/users/{empty_user}/favorites'),
+        Scenario('GET /users/<id>/favorites (1000)', 'GET', lambda i, rng: f'/users/{busy_user}/favorites'),
+        Scenario('GET /users/<id>/favorites (any)', 'GET', lambda i, rng: f'/users/{rng.randint(1, users)}/favorites'),
+        Scenario('GET /users/<id>/favorites/ids (1000)', 'GET', lambda i, rng: f'/users/{busy_user}/favorites/ids'),
+        Scenario('GET /users/<id>/favorites/contains', 'GET',
+                 lambda i, rng: f'/users/{rng.randint(1, users)}/favorites/contains'
+                                f'?planet={some_ids(rng)}&character={some_ids(rng)}&vehicle={some_ids(rng)}'),
+        *catalog,
+        *favorites,
+        Scenario('POST /users/<id>/favorites:batch', 'POST', lambda i, rng: f'/users/{empty_user}/favorites:batch',
+                 batch_body),
+        *exports,
+    ]
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(latencies, statuses, elapsed, rss):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(ordered),
+        'statuses': {str(status): count for status, count in sorted(Counter(statuses).items(), key=str)},
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        **rss,
+    }
+
+
+def read_hwm_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            match = re.search(r'^VmHWM:\s+(\d+) kB', status.read(), re.M)
+        return int(match.group(1)) if match else None
+    except OSError:
+        return None
+
+
+def reset_hwm(pid):
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class ClientDriver:
+    """Flask test client in this process, one request at a time."""
+    name = 'client'
+
+    def __init__(self, database, options):
+        os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        sys.path.insert(0, os.path.join(ROOT, 'src'))
+        from app import app
+        self.client = app.test_client()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def call(self, method, path, body, headers):
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, json=body, headers={'Accept-Encoding': 'gzip', **headers})
+        response.get_data()
+        response.close()
+        return time.perf_counter() - start, response.status_code
+
+    def run(self, scenario, requests, warmup):
+        rng = random.Random(scenario.name)
+        for index in range(warmup):
+            self.call(*scenario.request(index, rng))
+
+        exact = reset_hwm(os.getpid())
+        latencies, statuses = [], []
+        start = time.perf_counter()
+        for index in range(warmup, warmup + requests):
+            latency, status = self.call(*scenario.request(index, rng))
+            latencies.append(latency)
+            statuses.append(status)
+        elapsed = time.perf_counter() - start
+
+        if exact:
+            peak_kb = read_hwm_kb(os.getpid())
+        else:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == 'darwin':
+                peak_kb //= 1024
+        rss = {'peak_rss_mb': round(peak_kb / 1024, 1) if peak_kb else None, 'rss_exact': exact}
+        return summarize(latencies, statuses, elapsed, rss)
+
+
+class GunicornDriver:
+    """A gunicorn server started from src/wsgi.py, driven over keep-alive HTTP connections."""
+    name = 'gunicorn'
+
+    def __init__(self, database, options):
+        self.database = database
+        self.options = options
+        self.port = options.port or free_port()
+        self.process = None
+
+    def start(self):
+        env = {**os.environ, 'DATABASE_URL': f'sqlite:///{self.database}', 'LOG_LEVEL': 'WARNING'}
+        command = [sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', os.path.join(ROOT, 'src'),
+                   '--bind', f'127.0.0.1:{self.port}', '--workers', str(self.options.workers),
+                   '--threads', str(self.options.threads), '--log-level', 'warning']
+        self.process = subprocess.Popen(command, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                connection.request('GET', '/cache/stats')
+                connection.getresponse().read()
+                connection.close()
+                # Give every worker time to finish booting
+                time.sleep(1)
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError('gunicorn did not start within 30s')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def workers(self):
+        try:
+            with open(f'/proc/{self.process.pid}/task/{self.process.pid}/children') as children:
+                return [int(pid) for pid in children.read().split()]
+        except OSError:
+            return []
+
+    def worker_loop(self, scenario, indexes, rng_lock, rng, latencies, statuses):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {'Accept-Encoding': 'gzip', 'Content-Type': 'application/json'}
+        while True:
+            with rng_lock:
+                try:
+                    index = next(indexes)
+                except StopIteration:
+                    break
+                method, path, body, extra_headers = scenario.request(index, rng)
+            payload = json.dumps(body) if body is not None else None
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers={**headers, **extra_headers})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                status = 'error'
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+        connection.close()
+
+    def run(self, scenario, requests, warmup):
+        rng, rng_lock = random.Random(scenario.name), threading.Lock()
+        latencies, statuses = [], []
+        self.worker_loop(scenario, iter(range(warmup)), rng_lock, rng, [], [])
+
+        pids = self.workers()
+        exact = bool(pids) and all(reset_hwm(pid) for pid in pids)
+        indexes = iter(range(warmup, warmup + requests))
+        threads = [threading.Thread(target=self.worker_loop,
+                                    args=(scenario, indexes, rng_lock, rng, latencies, statuses))
+                   for _ in range(self.options.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        peaks = [kb for kb in (read_hwm_kb(pid) for pid in pids) if kb]
+        rss = {
+            'peak_rss_mb': round(max(peaks) / 1024, 1) if peaks else None,
+            'peak_rss_total_mb': round(sum(peaks) / 1024, 1) if peaks else None,
+            'rss_exact': exact,
+        }
+        return summarize(latencies, statuses, elapsed, rss)
+
+
+DRIVERS = {driver.name: driver for driver in (ClientDriver, GunicornDriver)}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=seeding.parse_scale, default='1k')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', help='SQLite file (default: benchmarks/data/bench_<rows>.db)')
+    parser.add_argument('--reseed', action='store_true', help='Recreate the database even if it exists')
+    parser.add_argument('--drivers', default='client,gunicorn', help='Comma separated: client, gunicorn')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads for the gunicorn driver')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--only', help='Run only endpoints whose name contains this text')
+    parser.add_argument('--output', help='JSON file to write (default: benchmarks/results/<commit>_<rows>.json)')
+    args = parser.parse_args()
+    # Read by the app when it is imported (client) or started (gunicorn)
+    os.environ.setdefault('EXPORT_TOKEN', 'benchmark')
+
+    database = args.database or seeding.default_database(args.scale)
+    if args.reseed or not os.path.exists(database):
+        print(f'Seeding {database}', file=sys.stderr)
+        seeding.seed(database, args.scale, args.users, args.seed,
+                     log=lambda line: print(line, file=sys.stderr))
+
+    selected = [scenario for scenario in scenarios(args.scale, args.users)
+                if not args.only or args.only in scenario.name]
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'scale': args.scale,
+            'users': args.users,
+            'seed': args.seed,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'env': {key: value for key, value in sorted(os.environ.items())
+                    if key.startswith(RECORDED_ENV_PREFIXES)},
+            'gunicorn': {'workers': args.workers, 'threads': args.threads, 'concurrency': args.concurrency},
+        },
+        'results': {},
+    }
+
+    for name in [name.strip() for name in args.drivers.split(',') if name.strip()]:
+        driver = DRIVERS[name](database, args)
+        try:
+            driver.start()
+        except (RuntimeError, OSError) as error:
+            print(f'Skipping {name}: {error}', file=sys.stderr)
+            continue
+        results = report['results'][name] = {}
+        try:
+            for scenario in selected:
+                results[scenario.name] = stats = driver.run(scenario, args.requests, args.warmup)
+                print(f'{name:<9} {scenario.name:<48} p50 {stats["p50_ms"]:>9.2f} ms  p99 {stats["p99_ms"]:>9.2f} ms'
+                      f'  {stats["throughput_rps"]:>8.1f} req/s  {stats["statuses"]}', file=sys.stderr)
+        finally:
+            driver.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{(commit or "unknown")[:10]}_{args.scale}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
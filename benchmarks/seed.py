@@ -0,0 +1,196 @@
+"""
+Seeds a fresh SQLite database with deterministic synthetic data.
+
+The same --scale and --seed always produce the same rows, ids and
+timestamps, so results from different commits are comparable.
+
+    python benchmarks/seed.py --scale 100k [--users 1000] [--seed 42] [--database PATH]
+
+--scale is the number of rows per catalog table (1k, 100k, 1m or a plain
+number). Users cycle through FAVORITE_LEVELS favorites each, split across
+characters, planets and vehicles, so the favorites routes are measured
+from empty users up to 1,000 favorites.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations', 'versions')
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+FAVORITE_LEVELS = (0, 1, 10, 100, 1000)
+BATCH_SIZE = 10_000
+# Fixed timestamp so ETags and Last-Modified do not change between runs
+SEEDED_AT = datetime(2024, 1, 1)
+
+WORDS = ('Aurra', 'Bail', 'Corran', 'Dorme', 'Ezra', 'Fode', 'Garazeb', 'Hera', 'Ima', 'Jyn',
+         'Kylo', 'Lando', 'Mace', 'Nien', 'Obi', 'Poe', 'Qui', 'Rey', 'Sabine', 'Tarkin',
+         'Ugnaught', 'Vader', 'Wedge', 'Xizor', 'Yoda', 'Zeb')
+GENDERS = ('male', 'female', 'n/a', 'hermaphrodite', 'none')
+EYE_COLORS = ('blue', 'brown', 'yellow', 'red', 'black', 'orange', 'hazel')
+CLIMATES = ('arid', 'temperate', 'tropical', 'frozen', 'murky', 'windy', 'hot')
+MANUFACTURERS = ('Corellia Mining Corporation', 'Incom Corporation', 'Kuat Drive Yards',
+                 'Sienar Fleet Systems', 'Aratech Repulsor Company', 'SoroSuub Corporation')
+COUNTRIES = ('Naboo', 'Tatooine', 'Alderaan', 'Corellia', 'Coruscant', 'Kashyyyk')
+
+
+def parse_scale(value):
+    value = value.lower()
+    if value in SCALES:
+        return SCALES[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Unknown scale {value!r}, use 1k, 100k, 1m or a number')
+
+
+def default_database(rows):
+    return os.path.join(DATA_DIR, f'bench_{rows}.db')
+
+
+def name(rng, index):
+    return f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index}'
+
+
+def characters(rng, rows):
+    for index in range(1, rows + 1):
+        yield {'id': index, 'name': name(rng, index), 'height': str(rng.randint(60, 240)),
+               'gender': rng.choice(GENDERS), 'eye_color': rng.choice(EYE_COLORS), 'updated_at': SEEDED_AT}
+
+
+def planets(rng, rows):
+    for index in range(1, rows + 1):
+        yield {'id': index, 'name': name(rng, index), 'climate': rng.choice(CLIMATES),
+               'population': rng.randint(0, 10 ** 9), 'gravity': f'{rng.randint(1, 30) / 10} standard',
+               'updated_at': SEEDED_AT}
+
+
+def vehicles(rng, rows):
+    for index in range(1, rows + 1):
+        yield {'id': index, 'name': name(rng, index), 'model': f'{rng.choice(WORDS)}-{rng.randint(1, 99)}',
+               'manufacturer': rng.choice(MANUFACTURERS), 'passengers': rng.randint(0, 500),
+               'max_speed': rng.randint(30, 1500), 'updated_at': SEEDED_AT}
+
+
+def users(rng, count):
+    for index in range(1, count + 1):
+        yield {'id': index, 'email': f'user{index}@example.com', 'password': 'benchmark', 'is_active': True,
+               'full_name': name(rng, index), 'address': f'{rng.randint(1, 999)} {rng.choice(WORDS)} Street',
+               'country': rng.choice(COUNTRIES)}
+
+
+def favorite_count(user_id):
+    return FAVORITE_LEVELS[(user_id - 1) % len(FAVORITE_LEVELS)]
+
+
+def favorites(rng, user_count, rows, target):
+    """Link rows for one favorite type; each user gets a third of its favorites here."""
+    for user_id in range(1, user_count + 1):
+        wanted = min(-(-favorite_count(user_id) // 3), rows)
+        for target_id in sorted(rng.sample(range(1, rows + 1), wanted)):
+            yield {'user_id': user_id, target: target_id}
+
+
+def insert_batches(connection, table, rows):
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            connection.execute(table.insert(), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def count_favorites(connection, links):
+    # Same backfill as migration 45100bf2fc9c
+    for table, (link_table, column) in links.items():
+        connection.exec_driver_sql(
+            f'UPDATE "{table}" SET favorite_count = '
+            f'(SELECT count(*) FROM {link_table} WHERE {link_table}.{column} = "{table}".id)'
+        )
+
+
+def load_migration(revision):
+    path = os.path.join(MIGRATIONS_DIR, f'{revision}_.py')
+    spec = importlib.util.spec_from_file_location(f'migration_{revision}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_search_tables(connection, tables):
+    # The FTS5 layout of migration 9f0c4e7d2a61, whose other steps cannot
+    # run on a create_all() schema
+    migration = load_migration('9f0c4e7d2a61')
+    for table in tables:
+        for statement in migration.sqlite_fts_statements(table):
+            connection.exec_driver_sql(statement)
+
+
+def seed(database, rows, user_count, seed=42, log=print):
+    """Creates `database` from scratch and fills it. Returns row counts per table."""
+    if os.path.exists(database):
+        os.remove(database)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+    from sqlalchemy import create_engine
+    sys.path.insert(0, SRC)
+    from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
+
+    rng = random.Random(seed)
+    engine = create_engine(f'sqlite:///{database}')
+    counts = {}
+    with engine.begin() as connection:
+        connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        db.metadata.create_all(connection)
+        plan = [
+            (User, users(rng, user_count)),
+            (Character, characters(rng, rows)),
+            (Planet, planets(rng, rows)),
+            (Vehicle, vehicles(rng, rows)),
+            (Fav_character, favorites(rng, user_count, rows, 'character_id')),
+            (Fav_planet, favorites(rng, user_count, rows, 'planet_id')),
+            (Fav_vehicle, favorites(rng, user_count, rows, 'vehicle_id')),
+        ]
+        for model, source in plan:
+            start = time.perf_counter()
+            counts[model.__tablename__] = insert_batches(connection, model.__table__, source)
+            log(f'{model.__tablename__:<14} {counts[model.__tablename__]:>9} rows  {time.perf_counter() - start:6.1f}s')
+        count_favorites(connection, {'character': ('fav_character', 'character_id'),
+                                     'planet': ('fav_planet', 'planet_id'),
+                                     'vehicle': ('fav_vehicle', 'vehicle_id')})
+        create_search_tables(connection, ('character', 'planet', 'vehicle'))
+        connection.exec_driver_sql('ANALYZE')
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=parse_scale, default='1k')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', help='SQLite file to create (default: benchmarks/data/bench_<rows>.db)')
+    args = parser.parse_args()
+
+    database = args.database or default_database(args.scale)
+    print(f'Seeding {database}: {args.scale} catalog rows, {args.users} users, seed {args.seed}')
+    seed(database, args.scale, args.users, args.seed)
+
+
+if __name__ == '__main__':
+    main()
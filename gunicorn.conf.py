@@ -0,0 +1,77 @@
+"""
+gunicorn settings, read with `gunicorn -c gunicorn.conf.py wsgi`.
+
+Workers default to 2 x usable CPUs + 1 with GUNICORN_THREADS threads each
+(WEB_CONCURRENCY overrides the worker count). The app is imported once in
+the master (preload_app) so workers share its memory copy-on-write and
+start instantly; each worker then drops the engine pools it inherited, so
+no database connection is ever used by two processes.
+
+PROMETHEUS_MULTIPROC_DIR defaults to a fresh temporary directory, removed
+on exit, so /metrics adds up the counters of every worker instead of
+reporting whichever worker answered the scrape.
+
+    WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_PRELOAD, GUNICORN_TIMEOUT,
+    GUNICORN_KEEPALIVE, GUNICORN_MAX_REQUESTS, PROMETHEUS_MULTIPROC_DIR
+"""
+import os
+import shutil
+import tempfile
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+
+def usable_cpus():
+    # CPUs this process may run on, which can be fewer than the host has
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+workers = int(os.getenv('WEB_CONCURRENCY', usable_cpus() * 2 + 1))
+# More than one thread switches the sync worker to gthread
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes', 'on')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then so slow leaks cannot pile up; 0 disables
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# prometheus_client picks its multiprocess mode when metrics.py is
+# imported, so this has to be set before the app is (pre)loaded
+_multiproc_dir_created = None
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    _multiproc_dir_created = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-')
+
+
+def on_starting(server):
+    # Values left over from the previous run would be added to this one's
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir and os.path.isdir(multiproc_dir):
+        for name in os.listdir(multiproc_dir):
+            if name.endswith('.db'):
+                os.remove(os.path.join(multiproc_dir, name))
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        # The worker imports the app itself, nothing was inherited
+        return
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's connections alone and only
+            # gives this worker fresh pools
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+
+def on_exit(server):
+    if _multiproc_dir_created:
+        shutil.rmtree(_multiproc_dir_created, ignore_errors=True)
@@ -38,6 +38,17 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # The full-text search tables (SQLite FTS5 and its shadow tables) and
+    # the PostgreSQL tsvector indexes are made by hand in migration
+    # 9f0c4e7d2a61 and have no model, keep autogenerate from dropping them
+    if type_ == 'table' and reflected and '_fts' in name:
+        return False
+    if type_ == 'index' and reflected and name.startswith('ix_') and name.endswith('_name_tsv'):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -52,7 +63,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -84,6 +96,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
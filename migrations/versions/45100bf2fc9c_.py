@@ -0,0 +1,42 @@
+"""favorite_count on catalog tables
+
+Revision ID: 45100bf2fc9c
+Revises: 9f0c4e7d2a61
+Create Date: 2026-10-17 22:14:08.531260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '45100bf2fc9c'
+down_revision = '9f0c4e7d2a61'
+branch_labels = None
+depends_on = None
+
+
+# table -> link table column pointing at it
+FAVORITE_LINKS = {
+    'character': ('fav_character', 'character_id'),
+    'planet': ('fav_planet', 'planet_id'),
+    'vehicle': ('fav_vehicle', 'vehicle_id'),
+}
+
+
+# Plain ALTER TABLE instead of batch mode: a SQLite batch would recreate the
+# tables and lose the FTS triggers added by 9f0c4e7d2a61
+def upgrade():
+    for table, (link_table, column) in FAVORITE_LINKS.items():
+        op.add_column(table, sa.Column('favorite_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            f'UPDATE "{table}" SET favorite_count = '
+            f'(SELECT count(*) FROM {link_table} WHERE {link_table}.{column} = "{table}".id)'
+        )
+        op.create_index(f'ix_{table}_favorite_count', table, ['favorite_count', 'id'], unique=False)
+
+
+def downgrade():
+    for table in FAVORITE_LINKS:
+        op.drop_index(f'ix_{table}_favorite_count', table_name=table)
+        op.drop_column(table, 'favorite_count')
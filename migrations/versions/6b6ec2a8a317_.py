@@ -0,0 +1,33 @@
+"""updated_at on catalog tables
+
+Revision ID: 6b6ec2a8a317
+Revises: c8d81b4e9cfa
+Create Date: 2026-10-17 11:40:02.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b6ec2a8a317'
+down_revision = 'c8d81b4e9cfa'
+branch_labels = None
+depends_on = None
+
+
+CATALOG_TABLES = ('character', 'planet', 'vehicle')
+
+
+def upgrade():
+    for table in CATALOG_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+            batch_op.create_index(f'ix_{table}_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in CATALOG_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_updated_at')
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,91 @@
+"""catalog filter indexes and name full-text search
+
+Revision ID: 9f0c4e7d2a61
+Revises: 6b6ec2a8a317
+Create Date: 2026-10-17 14:27:55.310962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f0c4e7d2a61'
+down_revision = '6b6ec2a8a317'
+branch_labels = None
+depends_on = None
+
+
+# table -> [(index name, columns)]
+FILTER_INDEXES = {
+    'character': [
+        ('ix_character_name', ['name', 'id']),
+        ('ix_character_gender', ['gender']),
+    ],
+    'planet': [
+        ('ix_planet_name', ['name', 'id']),
+        ('ix_planet_climate', ['climate']),
+        ('ix_planet_population', ['population', 'id']),
+    ],
+    'vehicle': [
+        ('ix_vehicle_name', ['name', 'id']),
+        ('ix_vehicle_manufacturer', ['manufacturer']),
+        ('ix_vehicle_max_speed', ['max_speed', 'id']),
+    ],
+}
+
+
+def sqlite_fts_statements(table):
+    # External content FTS5 table kept in sync with triggers.
+    # benchmarks/seed.py runs the same statements on its create_all() schema
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(name, content='{table}', content_rowid='id')",
+        f"INSERT INTO {fts}({fts}) VALUES('rebuild')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+    ]
+
+
+def create_sqlite_fts(table):
+    for statement in sqlite_fts_statements(table):
+        op.execute(statement)
+
+
+def drop_sqlite_fts(table):
+    fts = f'{table}_fts'
+    for suffix in ('ai', 'ad', 'au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+    op.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, indexes in FILTER_INDEXES.items():
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False)
+
+        if dialect == 'sqlite':
+            create_sqlite_fts(table)
+        elif dialect == 'postgresql':
+            op.execute(
+                f"CREATE INDEX ix_{table}_name_tsv ON \"{table}\" "
+                f"USING gin (to_tsvector('simple', name))"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, indexes in FILTER_INDEXES.items():
+        if dialect == 'sqlite':
+            drop_sqlite_fts(table)
+        elif dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_tsv')
+
+        for name, columns in indexes:
+            op.drop_index(name, table_name=table)
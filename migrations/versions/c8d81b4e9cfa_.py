@@ -0,0 +1,43 @@
+"""unique favorite links and foreign key indexes
+
+Revision ID: c8d81b4e9cfa
+Revises: 2dcb159fe6e3
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d81b4e9cfa'
+down_revision = '2dcb159fe6e3'
+branch_labels = None
+depends_on = None
+
+
+FAVORITE_TABLES = (
+    ('fav_character', 'character_id'),
+    ('fav_planet', 'planet_id'),
+    ('fav_vehicle', 'vehicle_id'),
+)
+
+
+def upgrade():
+    for table, target_column in FAVORITE_TABLES:
+        # Keep the oldest row of any duplicated (user, target) pair so the
+        # unique index can be built
+        op.execute(
+            f'DELETE FROM {table} WHERE id NOT IN '
+            f'(SELECT MIN(id) FROM {table} GROUP BY user_id, {target_column})'
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_user_id_{target_column}', ['user_id', target_column], unique=True)
+            batch_op.create_index(f'ix_{table}_{target_column}', [target_column], unique=False)
+
+
+def downgrade():
+    for table, target_column in FAVORITE_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_{target_column}')
+            batch_op.drop_index(f'ix_{table}_user_id_{target_column}')
@@ -1,22 +1,149 @@
+"""
+Flask-Admin views that stay fast on large tables.
+
+- Lists show ADMIN_PAGE_SIZE rows and count at most ADMIN_COUNT_CAP of
+  them, so a page never scans a whole table just to draw the pager.
+- Favorite links are loaded with their user and target joined in, and
+  show the user's email and the target's name instead of raw ids.
+- Search, filters, sorting and the ajax pickers of the forms only touch
+  indexed columns: names go through the same full-text search as `?q=`,
+  emails are prefix-matched on their unique index.
+
+    ADMIN_PAGE_SIZE, ADMIN_COUNT_CAP
+"""
 import os
 from flask_admin import Admin
-from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
 from flask_admin.contrib.sqla import ModelView
+from flask_admin.contrib.sqla.ajax import QueryAjaxModelLoader
+from flask_admin.contrib.sqla.filters import FilterEqual, FilterGreater, FilterSmaller
+from sqlalchemy import and_, func
+from filtering import search_clause
+from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
+
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 20))
+ADMIN_COUNT_CAP = int(os.getenv('ADMIN_COUNT_CAP', 10000))
+
+
+def email_prefix(term):
+    # A range on the unique email index instead of a LIKE scan
+    return and_(User.email >= term, User.email < term + '\uffff')
+
+
+def name_search(model):
+    return lambda term: search_clause(model, term)
+
+
+class IndexedAjaxLoader(QueryAjaxModelLoader):
+    """Form picker that searches with `search` and labels rows with `label_field`."""
+
+    def __init__(self, name, model, search, label_field):
+        super().__init__(name, db.session, model, fields=[label_field])
+        self.search = search
+        self.label_field = label_field
+
+    def format(self, model):
+        if model is None:
+            return None
+        return getattr(model, self.pk), getattr(model, self.label_field)
+
+    def get_list(self, term, offset=0, limit=10):
+        query = self.session.query(self.model)
+        if term:
+            query = query.filter(self.search(term))
+        return query.order_by(self.model.id).offset(offset).limit(limit).all()
+
+
+class ScalableModelView(ModelView):
+    page_size = ADMIN_PAGE_SIZE
+    can_set_page_size = True
+    column_display_pk = True
+    column_default_sort = ('id', True)
+    # get_list counts instead, with a cap
+    simple_list_pager = True
+
+    # term -> WHERE clause backed by an index, None disables search
+    search = None
+    search_label = None
+
+    def init_search(self):
+        return self.search is not None
+
+    def search_placeholder(self):
+        return self.search_label
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        return query.filter(self.search(search.strip())), count_query, joins, count_joins
+
+    def capped_count(self, query):
+        rows = query.limit(None).offset(None).order_by(None).with_entities(self.model.id).limit(ADMIN_COUNT_CAP)
+        return self.session.query(func.count()).select_from(rows.subquery()).scalar()
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        _, query = super().get_list(page, sort_column, sort_desc, search, filters, execute=False,
+                                    page_size=page_size)
+        count = self.capped_count(query)
+        return count, query.all() if execute else query
+
+
+class UserView(ScalableModelView):
+    column_exclude_list = ('password',)
+    column_sortable_list = ('id', 'email')
+    search = staticmethod(email_prefix)
+    search_label = 'Email starts with'
+    form_excluded_columns = ('favorite_character', 'favorite_planet', 'favorite_vehicle')
+
+
+class CatalogView(ScalableModelView):
+    search_label = 'Name'
+    # Kept by the favorites write path, and a form field for the links
+    # would load every one of them
+    form_excluded_columns = ('updated_at', 'favorite_count', 'favorite_by_links')
+
+    def __init__(self, model, session, **kwargs):
+        self.search = name_search(model)
+        self.column_sortable_list = ('id', 'name', 'updated_at', 'favorite_count', *model.range_fields)
+        self.column_filters = [
+            *(FilterEqual(getattr(model, name), name.replace('_', ' ').capitalize()) for name in model.filter_fields),
+            *(flt(getattr(model, name), name.replace('_', ' ').capitalize())
+              for name in model.range_fields for flt in (FilterGreater, FilterSmaller)),
+        ]
+        super().__init__(model, session, **kwargs)
+
+
+class FavoriteView(ScalableModelView):
+    column_sortable_list = ('id',)
+
+    def __init__(self, model, target_model, target, session, **kwargs):
+        target_id = getattr(model, f'{target}_id')
+        self.column_list = ('id', 'user', target)
+        self.column_select_related_list = (model.user, getattr(model, target))
+        self.column_formatters = {
+            'user': lambda view, context, link, name: link.user.email,
+            target: lambda view, context, link, name: getattr(link, target).name,
+        }
+        self.column_filters = [FilterEqual(model.user_id, 'User id'),
+                               FilterEqual(target_id, f'{target.capitalize()} id')]
+        self.form_ajax_refs = {
+            'user': IndexedAjaxLoader('user', User, email_prefix, 'email'),
+            target: IndexedAjaxLoader(target, target_model, name_search(target_model), 'name'),
+        }
+        super().__init__(model, session, **kwargs)
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Character, db.session))
-    admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(Vehicle, db.session))
-    admin.add_view(ModelView(Fav_character, db.session))
-    admin.add_view(ModelView(Fav_planet, db.session))
-    admin.add_view(ModelView(Fav_vehicle, db.session))
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(CatalogView(Character, db.session))
+    admin.add_view(CatalogView(Planet, db.session))
+    admin.add_view(CatalogView(Vehicle, db.session))
+    admin.add_view(FavoriteView(Fav_character, Character, 'character', db.session))
+    admin.add_view(FavoriteView(Fav_planet, Planet, 'planet', db.session))
+    admin.add_view(FavoriteView(Fav_vehicle, Vehicle, 'vehicle', db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(YourView(YourModelName, db.session))
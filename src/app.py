@@ -3,12 +3,29 @@ This module takes care of starting the API Server, Loading the DB and Adding the
 """
 import os
 from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
 from flask_cors import CORS
 from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
+from db_config import engine_options, configure_sqlite, describe_engine
+from replicas import replica_binds, replica_read, init_replicas
+from fields import get_fields, project, serialize_rows
+from pagination import get_page_args, get_sort, paginate, next_link, page_headers
+from filtering import get_filters, probe_fts_tables
+from lookup import get_ids, resolve_ids
+from reads import CORE_READS, read_page, read_one
+from streaming import streamable
+from conditional import conditional_get
+from metrics import init_metrics, metrics_response
+from query_budget import init_query_tracking, query_budget
+from compression import init_compression
+from json_provider import init_json
+from serializers import precompile_serializers
+from cache import response_cache, cached_response, register_cache_invalidation
+from catalog_import import catalog_cli
+from export import export_command, export_response
+from favorites import (add_favorite, remove_favorite, apply_favorite_changes, parse_favorite_changes, user_exists,
+                       register_favorite_counters, favorite_ids, FAVORITE_TYPES,
+                       FAVORITES_BATCH_MAX, CREATED, DELETED, NOT_FOUND, DUPLICATE, NOT_FAVORITE, SUPERSEDED)
+from models import db, User, Character, Planet, Vehicle
 # from models import Person
 
 app = Flask(__name__)
@@ -21,11 +38,41 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_BINDS'] = replica_binds(os.getenv('DATABASE_REPLICA_URLS'))
+app.logger.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
+
+# Only the `flask` CLI (`flask db ...`) needs Flask-Migrate and alembic,
+# server workers skip the import
+if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+    from flask_migrate import Migrate
+    MIGRATE = Migrate(app, db)
 db.init_app(app)
+with app.app_context():
+    for bind_key, engine in db.engines.items():
+        configure_sqlite(engine)
+        app.logger.info('Database engine %s: %s', bind_key or 'primary', describe_engine(engine))
+    # Otherwise the first ?q= request per process runs the table lookups
+    # and goes over its query budget. A replica that is down must not stop
+    # the app from starting, replicas.py takes it out of rotation
+    for engine in probe_fts_tables(db.engines.values(), Character, Planet, Vehicle):
+        app.logger.warning('Could not look up the search tables on %s, will retry on the first search',
+                           engine.url.render_as_string(hide_password=True))
+init_replicas(app, db)
+init_metrics(app, db)
+init_query_tracking(app)
+init_compression(app)
+init_json(app)
+precompile_serializers(User, Character, Planet, Vehicle)
 CORS(app)
-setup_admin(app)
+# ENABLE_ADMIN=0 leaves Flask-Admin out of API-only workers
+if os.getenv('ENABLE_ADMIN', '1').lower() in ('1', 'true', 'yes', 'on'):
+    from admin import setup_admin
+    setup_admin(app)
+register_cache_invalidation(Character, Planet, Vehicle)
+register_favorite_counters()
+app.cli.add_command(catalog_cli)
+app.cli.add_command(export_command)
 
 # Handle/serialize errors like a JSON object
 
@@ -42,22 +89,60 @@ def sitemap():
     return generate_sitemap(app)
 
 
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = metrics_response()
+    if metrics is None:
+        return jsonify({'msg': 'Metrics are disabled, install prometheus-client'}), 501
+    return metrics
+
+
+@app.route('/export/<table>', methods=['GET'])
+@replica_read
+def export_table(table):
+    return export_response(table)
+
+
+def lookup_response(model, ids, fields):
+    """`?ids=` on a list route: the rows in the requested order, plus the ids not found."""
+    if CORE_READS and fields is None:
+        # The same payload from plain rows
+        fields = list(model.public_fields)
+    rows, missing = resolve_ids(model, ids, fields)
+    return jsonify({
+        'msg': 'ok',
+        'results': serialize_rows(model, rows, fields),
+        'missing': missing
+    }), 200
+
+
 @app.route('/users', methods=['GET'])
+@query_budget(2)
+@replica_read
+@streamable(User)
 def get_users():
+    limit, after = get_page_args()
+    fields = get_fields(User)
     try:
-        query_results = User.query.all()
+        query_results, next_cursor = paginate(project(User.query, User, fields), User, limit, after)
 
-        if not query_results:
+        if not query_results and after is None:
             return jsonify({'msg': 'No users found'}), 400
 
-        users = list(map(lambda item: item.serialize(), query_results))
+        users = serialize_rows(User, query_results, fields)
 
         response_body = {
             'msg': 'ok',
-            'results': users
+            'results': users,
+            'next': next_link(next_cursor, limit)
         }
 
-        return jsonify(response_body), 200
+        return jsonify(response_body), 200, page_headers(db.session, User)
 
     except Exception as e:
         return jsonify({
@@ -66,9 +151,11 @@ def get_users():
         }), 500
 
 @app.route('/users/<int:id>/favorites', methods=['GET'])
+@query_budget(4)
+@replica_read
 def get_favorites(id):
     try:
-        query_result = User.query.get(id)
+        query_result = User.query.options(*User.favorites_options()).filter_by(id=id).first()
 
         if not query_result:
             return jsonify({'msg': 'No user found'}), 404
@@ -82,20 +169,84 @@ def get_favorites(id):
             'error': {str(e)}
         }), 500
 
+@app.route('/users/<int:id>/favorites/ids', methods=['GET'])
+@query_budget(2)
+@replica_read
+def get_favorite_ids(id):
+    try:
+        found = favorite_ids(id)
+        # Only an empty answer needs to tell a missing user from one without favorites
+        if not any(found.values()) and not user_exists(id):
+            return jsonify({'msg': 'No user found'}), 404
+
+        return jsonify({'msg': 'ok', **found}), 200
+
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({
+            'msg': f'Internal server error',
+            'error': str(e)
+        }), 500
+
+@app.route('/users/<int:id>/favorites/contains', methods=['GET'])
+@query_budget(2)
+@replica_read
+def get_favorite_contains(id):
+    targets = {kind: ids for kind in FAVORITE_TYPES if (ids := get_ids(name=kind)) is not None}
+    if not targets:
+        return jsonify({'msg': f"Pass the ids to check as ?{'=1,2&'.join(FAVORITE_TYPES)}=1,2"}), 400
+    try:
+        found = favorite_ids(id, targets)
+        if not any(found.values()) and not user_exists(id):
+            return jsonify({'msg': 'No user found'}), 404
+
+        response_body = {'msg': 'ok'}
+        for kind, ids in targets.items():
+            favorited = set(found[kind])
+            response_body[kind] = {target_id: target_id in favorited for target_id in ids}
+        return jsonify(response_body), 200
+
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({
+            'msg': f'Internal server error',
+            'error': str(e)
+        }), 500
+
 @app.route('/characters', methods=['GET'])
+@query_budget(4)
+@replica_read
+@conditional_get(Character)
+@streamable(Character)
+@cached_response('character')
 def get_characters():
+    sort = get_sort(Character)
+    limit, after = get_page_args(sort=sort)
+    fields = get_fields(Character)
+    criteria = get_filters(Character)
+    ids = get_ids()
     try:
-        query_results = Character.query.all()
+        if ids is not None:
+            return lookup_response(Character, ids, fields)
+
+        if CORE_READS:
+            characters, next_cursor = read_page(Character, fields, sort, criteria, limit, after)
+        else:
+            query = project(Character.query, Character, fields, sort).filter(*criteria)
+            query_results, next_cursor = paginate(query, Character, limit, after, sort)
+            characters = serialize_rows(Character, query_results, fields)
 
-        if not query_results:
+        if not characters and after is None:
             return jsonify({'msg': 'No characters found'}), 400
 
-        characters = list(map(lambda item: item.serialize(), query_results))
         response_body = {
             'msg': 'ok',
-            'results': characters
+            'results': characters,
+            'next': next_link(next_cursor, limit)
         }
-        return jsonify(response_body), 200
+        return jsonify(response_body), 200, page_headers(db.session, Character, criteria)
 
     except Exception as e:
         return ({
@@ -105,9 +256,18 @@ def get_characters():
 
 
 @app.route('/characters/<int:character_id>', methods=['GET'])
+@query_budget(2)
+@replica_read
+@conditional_get(Character, 'character_id')
+@cached_response('character')
 def get_character_id(character_id):
+    fields = get_fields(Character)
     try:
-        character = Character.query.get(character_id)
+        if CORE_READS:
+            character = read_one(Character, character_id, fields)
+        else:
+            character = project(Character.query, Character, fields).filter(Character.id == character_id).first()
+            character = serialize_rows(Character, [character], fields)[0] if character else None
 
         if not character:
             return jsonify({
@@ -116,7 +276,7 @@ def get_character_id(character_id):
 
         response_body = {
             'msg': 'ok',
-            'result': character.serialize()
+            'result': character
         }
         return jsonify(response_body)
     except Exception as e:
@@ -127,19 +287,37 @@ def get_character_id(character_id):
 
 
 @app.route('/planets', methods=['GET'])
+@query_budget(4)
+@replica_read
+@conditional_get(Planet)
+@streamable(Planet)
+@cached_response('planet')
 def get_planets():
+    sort = get_sort(Planet)
+    limit, after = get_page_args(sort=sort)
+    fields = get_fields(Planet)
+    criteria = get_filters(Planet)
+    ids = get_ids()
     try:
-        query_results = Planet.query.all()
+        if ids is not None:
+            return lookup_response(Planet, ids, fields)
 
-        if not query_results:
+        if CORE_READS:
+            planets, next_cursor = read_page(Planet, fields, sort, criteria, limit, after)
+        else:
+            query = project(Planet.query, Planet, fields, sort).filter(*criteria)
+            query_results, next_cursor = paginate(query, Planet, limit, after, sort)
+            planets = serialize_rows(Planet, query_results, fields)
+
+        if not planets and after is None:
             return jsonify({'msg': 'No planets found'}), 400
 
-        planets = list(map(lambda item: item.serialize(), query_results))
         response_body = {
             'msg': 'ok',
-            'results': planets
+            'results': planets,
+            'next': next_link(next_cursor, limit)
         }
-        return jsonify(response_body), 200
+        return jsonify(response_body), 200, page_headers(db.session, Planet, criteria)
 
     except Exception as e:
         return ({
@@ -149,9 +327,18 @@ def get_planets():
 
 
 @app.route('/planets/<int:planet_id>', methods=['GET'])
+@query_budget(2)
+@replica_read
+@conditional_get(Planet, 'planet_id')
+@cached_response('planet')
 def get_planet_id(planet_id):
+    fields = get_fields(Planet)
     try:
-        planet = Planet.query.get(planet_id)
+        if CORE_READS:
+            planet = read_one(Planet, planet_id, fields)
+        else:
+            planet = project(Planet.query, Planet, fields).filter(Planet.id == planet_id).first()
+            planet = serialize_rows(Planet, [planet], fields)[0] if planet else None
 
         if not planet:
             return jsonify({
@@ -160,7 +347,7 @@ def get_planet_id(planet_id):
 
         response_body = {
             'msg': 'ok',
-            'result': planet.serialize()
+            'result': planet
         }
         return jsonify(response_body), 200
     except Exception as e:
@@ -170,19 +357,37 @@ def get_planet_id(planet_id):
         }), 500
 
 @app.route('/vehicles', methods=['GET'])
+@query_budget(4)
+@replica_read
+@conditional_get(Vehicle)
+@streamable(Vehicle)
+@cached_response('vehicle')
 def get_cvehciles():
+    sort = get_sort(Vehicle)
+    limit, after = get_page_args(sort=sort)
+    fields = get_fields(Vehicle)
+    criteria = get_filters(Vehicle)
+    ids = get_ids()
     try:
-        query_results = Vehicle.query.all()
+        if ids is not None:
+            return lookup_response(Vehicle, ids, fields)
 
-        if not query_results:
+        if CORE_READS:
+            vehicles, next_cursor = read_page(Vehicle, fields, sort, criteria, limit, after)
+        else:
+            query = project(Vehicle.query, Vehicle, fields, sort).filter(*criteria)
+            query_results, next_cursor = paginate(query, Vehicle, limit, after, sort)
+            vehicles = serialize_rows(Vehicle, query_results, fields)
+
+        if not vehicles and after is None:
             return jsonify({'msg': 'No vehicles found'}), 400
 
-        vehicles = list(map(lambda item: item.serialize(), query_results))
         response_body = {
             'msg': 'ok',
-            'results': vehicles
+            'results': vehicles,
+            'next': next_link(next_cursor, limit)
         }
-        return jsonify(response_body), 200
+        return jsonify(response_body), 200, page_headers(db.session, Vehicle, criteria)
 
     except Exception as e:
         return ({
@@ -191,9 +396,18 @@ def get_cvehciles():
         }), 500
 
 @app.route('/vehicles/<int:vehicle_id>', methods=['GET'])
+@query_budget(2)
+@replica_read
+@conditional_get(Vehicle, 'vehicle_id')
+@cached_response('vehicle')
 def get_vehicle_id(vehicle_id):
+    fields = get_fields(Vehicle)
     try:
-        vehicle = Vehicle.query.get(vehicle_id)
+        if CORE_READS:
+            vehicle = read_one(Vehicle, vehicle_id, fields)
+        else:
+            vehicle = project(Vehicle.query, Vehicle, fields).filter(Vehicle.id == vehicle_id).first()
+            vehicle = serialize_rows(Vehicle, [vehicle], fields)[0] if vehicle else None
 
         if not vehicle:
             return jsonify({
@@ -202,7 +416,7 @@ def get_vehicle_id(vehicle_id):
 
         response_body = {
             'msg': 'ok',
-            'result': vehicle.serialize()
+            'result': vehicle
         }
         return jsonify(response_body), 200
     except Exception as e:
@@ -213,7 +427,62 @@ def get_vehicle_id(vehicle_id):
 
 
 
+# Most favorited first; ties go to the newest id
+POPULAR_SORT = ('favorite_count', True)
+
+
+def popular_response(model, plural):
+    limit, after = get_page_args(sort=POPULAR_SORT)
+    fields = [*model.public_fields, 'favorite_count']
+    try:
+        query = project(model.query, model, fields, POPULAR_SORT).filter(model.favorite_count > 0)
+        query_results, next_cursor = paginate(query, model, limit, after, POPULAR_SORT)
+
+        if not query_results and after is None:
+            return jsonify({'msg': f'No {plural} found'}), 400
+
+        response_body = {
+            'msg': 'ok',
+            'results': serialize_rows(model, query_results, fields),
+            'next': next_link(next_cursor, limit)
+        }
+        return jsonify(response_body), 200
+
+    except APIException:
+        raise
+    except Exception as e:
+        return ({
+            'msg': f'Internal server error',
+            'error': str(e)
+        }), 500
+
+
+# Read straight from the favorite_count index; not cached, since favorites
+# change the ranking without touching the catalog tables' cache versions
+@app.route('/characters/popular', methods=['GET'])
+@query_budget(1)
+@replica_read
+def get_popular_characters():
+    return popular_response(Character, 'characters')
+
+
+@app.route('/planets/popular', methods=['GET'])
+@query_budget(1)
+@replica_read
+def get_popular_planets():
+    return popular_response(Planet, 'planets')
+
+
+@app.route('/vehicles/popular', methods=['GET'])
+@query_budget(1)
+@replica_read
+def get_popular_vehicles():
+    return popular_response(Vehicle, 'vehicles')
+
+
+
 @app.route('/user', methods=['POST'])
+@query_budget(2)
 def create_user():
     data = request.get_json()
     if not data:
@@ -243,131 +512,153 @@ def create_user():
             'error': {str(e)}
             }), 500
     
+FAVORITE_STATUS_CODES = {
+    CREATED: 201,
+    DELETED: 200,
+    SUPERSEDED: 200,
+    DUPLICATE: 409,
+    NOT_FOUND: 404,
+    NOT_FAVORITE: 404,
+}
+
+
+@app.route('/users/<int:user_id>/favorites:batch', methods=['POST'])
+@query_budget(14)
+def batch_favorites(user_id):
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'msg': 'Send a list of {op, type, id} operations'}), 400
+    if len(operations) > FAVORITES_BATCH_MAX:
+        return jsonify({'msg': f'A batch can hold at most {FAVORITES_BATCH_MAX} operations'}), 400
+
+    try:
+        if not user_exists(user_id):
+            return jsonify({'msg': 'No user found'}), 404
+
+        changes, errors = parse_favorite_changes(operations)
+        statuses = apply_favorite_changes(user_id, [change[1:] for change in changes], user_checked=True) \
+            if changes else []
+
+        results = [None] * len(operations)
+        for (index, op, kind, target_id), status in zip(changes, statuses):
+            results[index] = {'op': op, 'type': kind, 'id': target_id,
+                              'status': FAVORITE_STATUS_CODES[status], 'result': status}
+        for index, message in errors.items():
+            results[index] = {**operations[index], 'status': 400, 'msg': message} if isinstance(operations[index], dict) \
+                else {'status': 400, 'msg': message}
+
+        return jsonify({'msg': 'ok', 'results': results}), 200
+    except APIException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
+
 @app.route('/users/<int:user_id>/favorite/planet/<int:planet_id>', methods=['POST'])
+@query_budget(3)
 def add_favorite_planet(user_id, planet_id):
     try:
-        user = User.query.get(user_id)
-        planet = Planet.query.get(planet_id)
-        if not user or not planet:
+        status = add_favorite('planet', user_id, planet_id)
+        if status == NOT_FOUND:
             return jsonify({"msg": "user or planet not found"}), 404
-        
-        existing_favorite = Fav_planet.query.filter_by(user_id=user_id, planet_id=planet_id).first()
-        if existing_favorite:
+        if status == DUPLICATE:
             return jsonify({
                 "msg": "Favorite already added"
             }), 409
-        
-        new_fav_planet = Fav_planet(user_id=user_id, planet_id=planet_id)
-        db.session.add(new_fav_planet)
-        db.session.commit()
 
-        return jsonify(new_fav_planet.serialize()), 201
+        return jsonify(db.session.get(Planet, planet_id).serialize()), 201
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({
-            'msg': f'Internal Server Error', 
-            'error': {str(e)}
-            }), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
     
 @app.route('/users/<int:user_id>/favorite/character/<int:character_id>', methods=['POST'])
+@query_budget(3)
 def add_favorite_character(user_id, character_id):
     try:
-        user = User.query.get(user_id)
-        character = Character.query.get(character_id)
-        if not user or not character:
-            return jsonify({"msg": "user or planet not found"}), 404
-        
-        existing_favorite = Fav_character.query.filter_by(user_id=user_id, character_id=character_id).first()
-        if existing_favorite:
+        status = add_favorite('character', user_id, character_id)
+        if status == NOT_FOUND:
+            return jsonify({"msg": "user or character not found"}), 404
+        if status == DUPLICATE:
             return jsonify({
                 "msg": "Favorite already added"
             }), 409
-        
-        new_fav_character = Fav_character(user_id=user_id, character_id=character_id)
-        db.session.add(new_fav_character)
-        db.session.commit()
 
-        return jsonify(new_fav_character.serialize()), 201
+        return jsonify(db.session.get(Character, character_id).serialize()), 201
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({'msg': f'Internal Server Error', 'error': {str(e)}}), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
     
 @app.route('/users/<int:user_id>/favorite/vehicle/<int:vehicle_id>', methods=['POST'])
+@query_budget(3)
 def add_favorite_vehicle(user_id, vehicle_id):
     try:
-        user = User.query.get(user_id)
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not user or not vehicle:
+        status = add_favorite('vehicle', user_id, vehicle_id)
+        if status == NOT_FOUND:
             return jsonify({"msg": "user or vehicle not found"}), 404
-        
-        existing_favorite = Fav_vehicle.query.filter_by(user_id=user_id, vehicle_id=vehicle_id).first()
-        if existing_favorite:
+        if status == DUPLICATE:
             return jsonify({
                 "msg": "Favorite already added"
             }), 409
-        
-        new_fav_vehicle = Fav_vehicle(user_id=user_id, vehicle_id=vehicle_id)
-        db.session.add(new_fav_vehicle)
-        db.session.commit()
 
-        return jsonify(new_fav_vehicle.serialize()), 201
+        return jsonify(db.session.get(Vehicle, vehicle_id).serialize()), 201
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({'msg': f'Internal Server Error', 'error': {str(e)}}), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
     
 @app.route('/users/<int:user_id>/favorite/planet/<int:planet_id>', methods=['DELETE'])
+@query_budget(3)
 def remove_favorite_planet(user_id, planet_id):
     try:
-        user = User.query.get(user_id)
-        planet = Planet.query.get(planet_id)
-        if not user or not planet:
+        status = remove_favorite('planet', user_id, planet_id)
+        if status == NOT_FOUND:
             return jsonify({'msg': 'user or planet not found'}), 404
-        
-        favorite_planet = Fav_planet.query.filter_by(user_id=user_id, planet_id=planet_id).first()
-        if not favorite_planet:
+        if status == NOT_FAVORITE:
             return jsonify({'msg': 'Favorite planet not found'}), 404
-        db.session.delete(favorite_planet)
-        db.session.commit()
         return jsonify({'msg': 'Favorite planet removed succesfully'}), 200
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({'msg': f'Internal Server Error', 'error': {str(e)}}), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
     
 @app.route('/users/<int:user_id>/favorite/character/<int:character_id>', methods=['DELETE'])
+@query_budget(3)
 def remove_favorite_character(user_id, character_id):
     try:
-        user = User.query.get(user_id)
-        character = Character.query.get(character_id)
-        if not user or not character:
+        status = remove_favorite('character', user_id, character_id)
+        if status == NOT_FOUND:
             return jsonify({'msg': 'user or character not found'}), 404
-        
-        favorite_character = Fav_character.query.filter_by(user_id=user_id, character_id=character_id).first()
-        if not favorite_character:
+        if status == NOT_FAVORITE:
             return jsonify({'msg': 'Favorite character not found'}), 404
-        db.session.delete(favorite_character)
-        db.session.commit()
         return jsonify({'msg': 'Favorite character removed succesfully'}), 200
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({'msg': f'Internal Server Error', 'error': {str(e)}}), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
     
 @app.route('/users/<int:user_id>/favorite/vehicle/<int:vehicle_id>', methods=['DELETE'])
+@query_budget(3)
 def remove_favorite_vehicle(user_id, vehicle_id):
     try:
-        user = User.query.get(user_id)
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not user or not vehicle:
+        status = remove_favorite('vehicle', user_id, vehicle_id)
+        if status == NOT_FOUND:
             return jsonify({'msg': 'user or vehicle not found'}), 404
-        
-        favorite_vehicle = Fav_vehicle.query.filter_by(user_id=user_id, vehicle_id=vehicle_id).first()
-        if not favorite_vehicle:
+        if status == NOT_FAVORITE:
             return jsonify({'msg': 'Favorite vehicle not found'}), 404
-        db.session.delete(favorite_vehicle)
-        db.session.commit()
         return jsonify({'msg': 'Favorite vehicle removed succesfully'}), 200
+    except APIException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({'msg': f'Internal Server Error', 'error': {str(e)}}), 500
+        return jsonify({'msg': f'Internal Server Error', 'error': str(e)}), 500
 
 
 # this only runs if `$ python src/app.py` is executed
@@ -0,0 +1,166 @@
+"""
+Optional ASGI entry point for the read-only routes, on async SQLAlchemy.
+
+    uvicorn asgi:app --app-dir src --workers 2
+
+Serves the catalog lists and details and a user's favorites with the same
+models, query-string parsing and serializers as the Flask app, but on an
+AsyncSession, so a worker keeps serving other clients while it waits on
+the database or on a slow client. Writes, admin, streaming, the response
+cache and conditional GETs stay on the WSGI app (src/wsgi.py); put both
+behind the same proxy and route these GETs here.
+
+The async driver URL is derived from DATABASE_URL (sqlite -> aiosqlite,
+postgresql -> asyncpg) unless ASYNC_DATABASE_URL is set. Needs starlette,
+uvicorn and aiosqlite or asyncpg.
+"""
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from db_config import engine_options, configure_sqlite
+from fields import get_fields, select_columns, serialize_rows
+from filtering import get_filters, has_fts_table
+from lookup import get_ids, ids_statement, order_by_ids
+from pagination import get_page_args, get_sort, keyset_criteria, order_by_clauses, split_page, \
+    wants_total_count, count_statement
+from serializers import precompile_serializers
+from utils import APIException
+from models import User, Character, Planet, Vehicle
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_url():
+    url = os.getenv('ASYNC_DATABASE_URL')
+    if url:
+        return url
+    url = make_url(os.getenv('DATABASE_URL', 'sqlite:////tmp/test.db').replace('postgres://', 'postgresql://'))
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False)
+
+
+def async_engine_options(url):
+    options = engine_options(url)
+    # TimedQueuePool is a sync pool; async engines bring their own
+    options.pop('poolclass', None)
+    return options
+
+
+DATABASE_URL = async_database_url()
+engine = create_async_engine(DATABASE_URL, **async_engine_options(DATABASE_URL))
+configure_sqlite(engine.sync_engine)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def json_response(body, status_code=200, headers=None):
+    content = orjson.dumps(body) if orjson is not None else json.dumps(body)
+    return Response(content, status_code, headers, media_type='application/json')
+
+
+def next_link(request, next_cursor, limit):
+    if next_cursor is None:
+        return None
+    args = dict(request.query_params)
+    args.update(limit=limit, cursor=next_cursor)
+    return f'{request.url.path}?{urlencode(args)}'
+
+
+def list_view(model, plural):
+    async def view(request):
+        args = request.query_params
+        sort = get_sort(model, args)
+        limit, after = get_page_args(args, sort)
+        fields = get_fields(model, args)
+        criteria = get_filters(model, args, engine.sync_engine)
+        ids = get_ids(args)
+
+        if ids is not None:
+            async with Session() as session:
+                result = await session.execute(ids_statement(model, ids, fields))
+                rows, missing = order_by_ids(result.all() if fields else result.scalars().all(), ids)
+            return json_response({'msg': 'ok', 'results': serialize_rows(model, rows, fields), 'missing': missing})
+
+        stmt = select(*select_columns(model, fields, sort)) if fields else select(model)
+        stmt = stmt.where(*criteria, *keyset_criteria(model, after, sort)) \
+            .order_by(*order_by_clauses(model, sort)).limit(limit + 1)
+        async with Session() as session:
+            result = await session.execute(stmt)
+            rows = result.all() if fields else result.scalars().all()
+            headers = {}
+            if wants_total_count(args):
+                headers['X-Total-Count'] = str((await session.execute(count_statement(model, criteria))).scalar_one())
+
+        rows, next_cursor = split_page(rows, model, limit, sort)
+        if not rows and after is None:
+            return json_response({'msg': f'No {plural} found'}, 400)
+        return json_response({
+            'msg': 'ok',
+            'results': serialize_rows(model, rows, fields),
+            'next': next_link(request, next_cursor, limit),
+        }, headers=headers)
+    return view
+
+
+def detail_view(model, name):
+    async def view(request):
+        fields = get_fields(model, request.query_params)
+        stmt = select(*select_columns(model, fields)) if fields else select(model)
+        async with Session() as session:
+            result = await session.execute(stmt.where(model.id == request.path_params['id']))
+            row = result.first() if fields else result.scalars().first()
+        if not row:
+            return json_response({'msg': f'{name} not found'}, 400)
+        return json_response({'msg': 'ok', 'result': serialize_rows(model, [row], fields)[0]})
+    return view
+
+
+async def get_favorites(request):
+    stmt = select(User).options(*User.favorites_options()).where(User.id == request.path_params['id'])
+    async with Session() as session:
+        user = (await session.execute(stmt)).scalars().first()
+    if not user:
+        return json_response({'msg': 'No user found'}, 404)
+    return json_response(user.serialize_with_favorites())
+
+
+async def handle_invalid_usage(request, error):
+    return json_response(error.to_dict(), error.status_code)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    precompile_serializers(User, Character, Planet, Vehicle)
+    # Look up the FTS tables once; the sync inspector cannot run per request
+    async with engine.connect() as connection:
+        await connection.run_sync(lambda sync_connection: [
+            has_fts_table(model, sync_connection) for model in (Character, Planet, Vehicle)
+        ])
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/characters', list_view(Character, 'characters')),
+        Route('/characters/{id:int}', detail_view(Character, 'Character')),
+        Route('/planets', list_view(Planet, 'planets')),
+        Route('/planets/{id:int}', detail_view(Planet, 'Planet')),
+        Route('/vehicles', list_view(Vehicle, 'vehicles')),
+        Route('/vehicles/{id:int}', detail_view(Vehicle, 'Vehicle')),
+        Route('/users/{id:int}/favorites', get_favorites),
+    ],
+    exception_handlers={APIException: handle_invalid_usage},
+    lifespan=lifespan,
+)
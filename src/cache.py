@@ -0,0 +1,212 @@
+"""
+In-process LRU + TTL cache of serialized GET responses.
+
+Entries are tagged with the table they were built from. SQLAlchemy
+after_insert/after_update/after_delete events on the cached models record
+the touched tables on the session and the matching entries are dropped
+when that session commits, so edits made through the API or Flask-Admin
+both evict stale payloads. Concurrent misses for one key are collapsed so
+only the first request hits the database (single-flight).
+
+Those events only fire in this process. Behind conditional_get an entry
+also remembers the ETag it was built under, and a request whose freshly
+computed ETag differs treats it as a miss, so edits made by another
+worker, raw SQL or `flask catalog import` are picked up on the next
+request instead of after the TTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import g, request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 60))
+
+# Response headers worth replaying from a cached entry
+CACHED_HEADERS = ('Content-Type', 'X-Total-Count')
+
+
+class CacheEntry:
+    __slots__ = ('tag', 'validator', 'expires_at', 'body', 'headers', 'variants')
+
+    def __init__(self, tag, validator, expires_at, body, headers):
+        self.tag = tag
+        self.validator = validator
+        self.expires_at = expires_at
+        self.body = body
+        self.headers = headers
+        # Content-Encoding -> compressed body, filled in by compression.py
+        self.variants = {}
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _lookup(self, key, validator=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # Expired, or built before a change this process never saw
+        if entry.expires_at <= time.monotonic() or entry.validator != validator:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key, validator=None):
+        with self._lock:
+            entry = self._lookup(key, validator)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def get_or_build(self, key, tag, build, validator=None):
+        """
+        Returns the cached entry for `key`, calling `build()` on a miss or when
+        the entry was built under another `validator`. `build` returns
+        `(body, headers)` or None when the result must not be cached.
+        """
+        entry = self.get(key, validator)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            flight = self._inflight.setdefault(key, threading.Lock())
+        with flight:
+            # Another request may have filled the entry while we waited
+            with self._lock:
+                entry = self._lookup(key, validator)
+                generation = self._generations.get(tag, 0)
+            if entry is not None:
+                return entry
+            try:
+                built = build()
+                if built is None:
+                    return None
+                entry = CacheEntry(tag, validator, time.monotonic() + self.ttl, *built)
+                self._store(key, entry, generation)
+                return entry
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def _store(self, key, entry, generation):
+        with self._lock:
+            # A commit touched the table while we were building: the body
+            # may already be stale, so serve it once but do not keep it
+            if self._generations.get(entry.tag, 0) != generation:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry.tag == tag]
+            for key in stale:
+                del self._entries[key]
+            self.evictions += len(stale)
+
+    def clear(self):
+        with self._lock:
+            for tag in self._generations:
+                self._generations[tag] += 1
+            self.evictions += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cache_key():
+    args = sorted(request.args.items(multi=True))
+    query = '&'.join(f'{name}={value}' for name, value in args)
+    return f'{request.path}?{query}'
+
+
+def cached_response(tag):
+    """Caches 200 responses of a GET view under `tag` (the model's table name)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return view(*args, **kwargs)
+
+            uncached = []
+
+            def build():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    uncached.append(response)
+                    return None
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                return response.get_data(), headers
+
+            # Set by conditional_get, which runs first
+            validator = g.get('response_validator')
+            entry = response_cache.get_or_build(cache_key(), tag, build, validator)
+            if entry is None:
+                return uncached[0]
+            response = make_response(entry.body, 200, entry.headers)
+            response.cache_entry = entry
+            return response
+        return wrapper
+    return decorator
+
+
+def _mark_dirty(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('dirty_cache_tags', set()).add(mapper.local_table.name)
+
+
+def _flush_dirty(session):
+    for tag in session.info.pop('dirty_cache_tags', ()):
+        response_cache.invalidate(tag)
+
+
+def _forget_dirty(session, previous_transaction):
+    session.info.pop('dirty_cache_tags', None)
+
+
+def register_cache_invalidation(*models):
+    for model in models:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, _mark_dirty)
+    if not event.contains(Session, 'after_commit', _flush_dirty):
+        event.listen(Session, 'after_commit', _flush_dirty)
+        event.listen(Session, 'after_soft_rollback', _forget_dirty)
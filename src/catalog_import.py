@@ -0,0 +1,218 @@
+"""
+`flask catalog import` - bulk loads characters, planets or vehicles.
+`flask catalog recount-favorites` - rebuilds their `favorite_count`.
+
+Files are read as a stream of records (JSON arrays are decoded element by
+element) and written in batches: one executemany INSERT per batch on SQLite
+and other databases, `COPY ... FROM STDIN` on PostgreSQL/psycopg2. With
+`--upsert`, rows whose `name` already exists are updated in place instead.
+"""
+import csv
+import io
+import json
+import os
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, insert, select, update
+from favorites import recount_favorites, FAVORITE_TYPES
+from models import db, utcnow, Character, Planet, Vehicle
+
+IMPORT_BATCH_SIZE = int(os.getenv('CATALOG_IMPORT_BATCH_SIZE', 5000))
+
+CATALOG_MODELS = {
+    'characters': Character,
+    'planets': Planet,
+    'vehicles': Vehicle,
+}
+
+# SWAPI field names that differ from our columns
+FIELD_ALIASES = {
+    'max_atmosphering_speed': 'max_speed',
+}
+
+FILE_FORMATS = {
+    '.json': 'json',
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+catalog_cli = AppGroup('catalog', help='Manage the characters, planets and vehicles catalog.')
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """Yields the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        # A single object, e.g. one SWAPI page: {"count": .., "results": [...]}
+        document = json.loads(buffer + stream.read())
+        yield from document.get('results', [document])
+        return
+
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise click.ClickException('Unexpected end of JSON array')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from iter_json_array(stream)
+
+
+def to_int(value):
+    # SWAPI uses strings such as "1,000", "unknown" and "n/a"
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).replace(',', '').strip())
+    except ValueError:
+        return 0
+
+
+def to_row(model, record):
+    """Maps a raw record onto the model's columns, ignoring unknown fields."""
+    record = {FIELD_ALIASES.get(key, key): value for key, value in record.items()}
+    row = {}
+    for column in model.__table__.columns:
+        # favorite_count belongs to the favorites, not to the catalog data
+        if column.primary_key or column.name in ('updated_at', 'favorite_count'):
+            continue
+        if column.name not in record:
+            raise click.ClickException(f'Record {record.get("name")!r} has no {column.name!r} field')
+        value = record[column.name]
+        row[column.name] = to_int(value) if column.type.python_type is int else str(value)
+    row['updated_at'] = utcnow()
+    return row
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def split_existing(model, rows):
+    """Splits a batch into (new rows, rows for existing names with their ids)."""
+    # The last record wins when a name repeats inside the batch
+    rows = list({row['name']: row for row in rows}.values())
+    stmt = select(model.name, model.id).where(model.name.in_([row['name'] for row in rows]))
+    existing = dict(db.session.execute(stmt).all())
+    new_rows, updates = [], []
+    for row in rows:
+        if row['name'] in existing:
+            updates.append({**row, 'row_id': existing[row['name']]})
+        else:
+            new_rows.append(row)
+    return new_rows, updates
+
+
+def copy_rows(model, rows):
+    """Inserts rows with COPY when running on psycopg2, returns False otherwise."""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql' or connection.dialect.driver != 'psycopg2':
+        return False
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{model.__tablename__}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+    finally:
+        cursor.close()
+    return True
+
+
+def insert_rows(model, rows):
+    if rows and not copy_rows(model, rows):
+        db.session.execute(insert(model.__table__), rows)
+
+
+def update_rows(model, rows):
+    if not rows:
+        return
+    table = model.__table__
+    # bindparam names may not clash with the column names being SET
+    params = [{f'b_{name}': value for name, value in row.items()} for row in rows]
+    values = {name: bindparam(f'b_{name}') for name in rows[0] if name != 'row_id'}
+    stmt = update(table).where(table.c.id == bindparam('b_row_id')).values(values)
+    db.session.connection().execute(stmt, params)
+
+
+@catalog_cli.command('import')
+@click.argument('entity', type=click.Choice(sorted(CATALOG_MODELS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['json', 'csv', 'ndjson']),
+              help='File format, guessed from the extension when omitted.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option('--upsert', is_flag=True, help='Update rows whose name already exists instead of inserting duplicates.')
+@click.option('--dry-run', is_flag=True, help='Parse and validate the file without writing anything.')
+def import_command(entity, path, fmt, batch_size, upsert, dry_run):
+    """Bulk load ENTITY records from a SWAPI-style JSON, CSV or NDJSON file."""
+    model = CATALOG_MODELS[entity]
+    fmt = fmt or FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise click.ClickException('Cannot guess the file format, pass --format')
+
+    inserted = updated = 0
+    try:
+        with open(path, newline='', encoding='utf-8') as stream:
+            rows = (to_row(model, record) for record in iter_records(stream, fmt))
+            for batch in batched(rows, batch_size):
+                new_rows, updates = split_existing(model, batch) if upsert else (batch, [])
+                if not dry_run:
+                    insert_rows(model, new_rows)
+                    update_rows(model, updates)
+                inserted += len(new_rows)
+                updated += len(updates)
+        if dry_run:
+            db.session.rollback()
+        else:
+            # Imported rows get a new updated_at, which moves the ETag the
+            # servers' response caches are keyed on
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    prefix = 'Dry run: would have' if dry_run else 'Done:'
+    click.echo(f'{prefix} inserted {inserted} and updated {updated} {entity}')
+
+
+@catalog_cli.command('recount-favorites')
+@click.option('--type', 'kinds', type=click.Choice(sorted(FAVORITE_TYPES)), multiple=True,
+              help='Only recount this favorite type; may be repeated. All types by default.')
+def recount_favorites_command(kinds):
+    """Recompute favorite_count from the fav_* tables and fix any drift."""
+    fixed = recount_favorites(kinds)
+    for kind, rows in fixed.items():
+        click.echo(f'{kind}: fixed {rows} counters')
@@ -0,0 +1,92 @@
+"""
+Response compression negotiated through `Accept-Encoding`.
+
+Brotli is used when the `brotli` package is installed and the client
+accepts it, gzip otherwise. Bodies under COMPRESS_MIN_SIZE bytes are sent
+as is. When a response comes from the response cache, the compressed
+bytes are stored on the cache entry, so a hot payload is compressed once
+per version instead of on every request.
+
+    COMPRESS_MIN_SIZE, COMPRESS_LEVEL (gzip 1-9), BROTLI_QUALITY (0-11)
+"""
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/csv')
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def etag_variants(etag):
+    """The ETag of every representation of one response, compressed or not."""
+    return [etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS)]
+
+
+def not_modified_response(response):
+    """
+    A 304 carries the ETag and Vary the 200 would have had (RFC 9110,
+    15.4.5): the negotiated encoding's ETag, unless the client holds the
+    uncompressed one, which is also what bodies under COMPRESS_MIN_SIZE get.
+    """
+    etag, weak = response.get_etag()
+    if not etag:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is not None and not request.if_none_match.contains(etag):
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+
+def compress_response(response):
+    if response.status_code == 304:
+        return not_modified_response(response)
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None or response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    entry = getattr(response, 'cache_entry', None)
+    if entry is None:
+        compressed = compress(body, encoding)
+    else:
+        compressed = entry.variants.get(encoding)
+        if compressed is None:
+            compressed = entry.variants[encoding] = compress(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different representation and needs its own strong ETag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
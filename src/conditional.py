@@ -0,0 +1,74 @@
+"""
+Conditional GET (ETag / Last-Modified) for the catalog routes.
+
+Validators come from one aggregate query on the indexed `updated_at`
+column, never from the response body, so a matching `If-None-Match` or
+`If-Modified-Since` is answered with 304 before any row is loaded or
+serialized.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import g, request, make_response
+from sqlalchemy import func, select
+from compression import etag_variants
+from models import db
+
+
+def table_validator(model):
+    # count(id) catches deletes, which do not move max(updated_at)
+    stmt = select(func.max(model.updated_at), func.count(model.id))
+    return db.session.execute(stmt).one()
+
+
+def row_validator(model, row_id):
+    stmt = select(model.updated_at, model.id).where(model.id == row_id)
+    return db.session.execute(stmt).first()
+
+
+def make_etag(model, validator):
+    last_modified, marker = validator
+    seed = f'{model.__tablename__}:{last_modified.isoformat()}:{marker}:{request.full_path}'
+    return hashlib.sha1(seed.encode()).hexdigest()
+
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return any(request.if_none_match.contains(tag) for tag in etag_variants(etag))
+    if request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_get(model, id_arg=None):
+    """
+    Adds ETag/Last-Modified to 200 responses of a GET view and answers 304
+    when the client copy is current. `id_arg` names the URL argument of
+    detail routes; list routes are validated against the whole table.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if id_arg is None:
+                validator = table_validator(model)
+            else:
+                validator = row_validator(model, kwargs[id_arg])
+            # Empty table or unknown id: let the view build its error response
+            if validator is None or validator[0] is None:
+                return view(*args, **kwargs)
+
+            etag = make_etag(model, validator)
+            # cached_response keeps entries only while this ETag holds
+            g.response_validator = etag
+            last_modified = validator[0].replace(tzinfo=timezone.utc)
+            if is_not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
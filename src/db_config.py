@@ -0,0 +1,94 @@
+"""
+Engine and connection pool settings, driven by environment variables.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE
+
+SQLite connections also get their pragmas set on connect (WAL journal by
+default, so readers no longer block the writer and concurrent gunicorn
+workers stop failing with "database is locked"):
+
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT
+"""
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that stores how long a checkout waited for a connection in
+    `connection_record.info['checkout_wait']`, for the pool 'checkout' event.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        record = super()._do_get()
+        record.info['checkout_wait'] = time.perf_counter() - start
+        return record
+
+
+def engine_options(database_uri):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS for `database_uri`."""
+    url = make_url(database_uri)
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        # Compiled SQL cache entries kept per engine
+        'query_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', 500)),
+    }
+    # In-memory SQLite runs on a single shared connection, nothing to size
+    if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        )
+    return options
+
+
+def sqlite_pragmas():
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are KiB, i.e. 64 MiB of page cache per connection
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+    }
+
+
+def configure_sqlite(engine):
+    """Applies `sqlite_pragmas()` to every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def describe_engine(engine):
+    """One line summary of the effective engine settings, for the startup log."""
+    pool = engine.pool
+    settings = [f'url={engine.url.render_as_string(hide_password=True)}', f'pool={type(pool).__name__}']
+    if hasattr(pool, 'size'):
+        settings += [f'pool_size={pool.size()}', f'max_overflow={pool._max_overflow}', f'pool_timeout={pool._timeout}']
+    settings += [f'pool_recycle={pool._recycle}', f'pre_ping={pool._pre_ping}']
+    if engine.dialect.name == 'sqlite':
+        settings += [f'{name}={value}' for name, value in sqlite_pragmas().items()]
+    return ' '.join(settings)
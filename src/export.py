@@ -0,0 +1,224 @@
+"""
+Bulk export of the users, catalog and favorite link tables.
+
+`flask export [TABLE...]` writes one file per table and
+`GET /export/<table>` streams the same bytes. A table is read once, in
+primary key order, through a `yield_per` cursor (server-side on
+PostgreSQL) and encoded batch by batch, so memory stays flat however many
+rows it has.
+
+Formats are ndjson and csv, both optionally gzipped, plus the columnar
+arrow (IPC stream) and parquet when pyarrow is installed; those two carry
+their own compression. The route needs `Authorization: Bearer
+<EXPORT_TOKEN>` and is off while EXPORT_TOKEN is unset.
+
+    EXPORT_TOKEN, EXPORT_BATCH_SIZE
+"""
+import csv
+import hmac
+import io
+import os
+import zlib
+from datetime import datetime
+import click
+from flask import Response, current_app, request, stream_with_context
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from utils import APIException
+from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 5000))
+EXPORT_TOKEN = os.getenv('EXPORT_TOKEN')
+
+EXPORT_MODELS = {model.__tablename__: model
+                 for model in (User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle)}
+
+# Never leaves the database
+EXCLUDED_COLUMNS = ('password',)
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+COLUMNAR_FORMATS = ('arrow', 'parquet')
+
+
+def export_columns(model):
+    return [column for column in model.__table__.columns if column.name not in EXCLUDED_COLUMNS]
+
+
+def iter_batches(model, columns):
+    """Yields lists of row tuples, EXPORT_BATCH_SIZE at a time."""
+    stmt = select(*columns).order_by(*model.__table__.primary_key.columns)
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    yield from result.partitions()
+
+
+def text_rows(columns, batch):
+    # ISO 8601 timestamps whichever JSON provider is active
+    dates = [index for index, column in enumerate(columns) if column.type.python_type is datetime]
+    if not dates:
+        return batch
+    rows = []
+    for row in batch:
+        row = list(row)
+        for index in dates:
+            if row[index] is not None:
+                row[index] = row[index].isoformat()
+        rows.append(row)
+    return rows
+
+
+def iter_ndjson(columns, batches):
+    dumps = current_app.json.dumps
+    names = [column.name for column in columns]
+    for batch in batches:
+        yield ''.join(dumps(dict(zip(names, row))) + '\n' for row in text_rows(columns, batch)).encode()
+
+
+def iter_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    for batch in batches:
+        writer.writerows(text_rows(columns, batch))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only the header when the table is empty
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class ChunkSink:
+    """Write-only file object that hands over what pyarrow wrote since the last drain."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_schema(columns):
+    types = {int: pyarrow.int64(), str: pyarrow.string(), bool: pyarrow.bool_(), datetime: pyarrow.timestamp('us')}
+    return pyarrow.schema([pyarrow.field(column.name, types[column.type.python_type], column.nullable)
+                           for column in columns])
+
+
+def iter_columnar(columns, batches, fmt):
+    schema = arrow_schema(columns)
+    sink = ChunkSink()
+    # For parquet, each batch becomes one row group
+    writer = pyarrow.ipc.new_stream(sink, schema) if fmt == 'arrow' else pyarrow.parquet.ParquetWriter(sink, schema)
+    for batch in batches:
+        writer.write_batch(pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(zip(*batch), schema)], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def check_format(fmt, gzip):
+    if fmt not in EXPORT_FORMATS:
+        raise APIException(f"format must be one of {', '.join(EXPORT_FORMATS)}", status_code=400)
+    if fmt in COLUMNAR_FORMATS and pyarrow is None:
+        raise APIException(f'{fmt} export needs pyarrow, which is not installed', status_code=501)
+    if fmt in COLUMNAR_FORMATS and gzip:
+        raise APIException(f'{fmt} files are compressed already, gzip is only for ndjson and csv', status_code=400)
+
+
+def export_chunks(model, fmt, gzip=False):
+    """The bytes of one table export, as an iterator of chunks."""
+    columns = export_columns(model)
+    batches = iter_batches(model, columns)
+    if fmt == 'ndjson':
+        chunks = iter_ndjson(columns, batches)
+    elif fmt == 'csv':
+        chunks = iter_csv(columns, batches)
+    else:
+        chunks = iter_columnar(columns, batches, fmt)
+    return gzipped(chunks) if gzip else chunks
+
+
+def export_filename(table, fmt, gzip=False):
+    return f'{table}.{EXPORT_FORMATS[fmt][1]}' + ('.gz' if gzip else '')
+
+
+def check_export_token():
+    if not EXPORT_TOKEN:
+        raise APIException('Export is disabled, set EXPORT_TOKEN', status_code=403)
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), EXPORT_TOKEN.encode()):
+        raise APIException('A valid export token is required', status_code=401)
+
+
+def export_response(table):
+    """Streams one table as an attachment; `?format=` and `?gzip=1` pick the encoding."""
+    check_export_token()
+    model = EXPORT_MODELS.get(table)
+    if model is None:
+        raise APIException(f"Unknown table, use one of {', '.join(EXPORT_MODELS)}", status_code=404)
+    fmt = request.args.get('format', 'ndjson').lower()
+    gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    check_format(fmt, gzip)
+
+    mimetype = 'application/gzip' if gzip else EXPORT_FORMATS[fmt][0]
+    # Like ?stream=, the query runs inside the generator, on the session
+    # that lives as long as the body
+    response = Response(stream_with_context(export_chunks(model, fmt, gzip)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(table, fmt, gzip)}"'
+    return response
+
+
+@click.command('export')
+@click.argument('tables', nargs=-1, type=click.Choice(list(EXPORT_MODELS)))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+@click.option('--gzip', is_flag=True, help='Gzip ndjson and csv files.')
+@click.option('--output-dir', type=click.Path(file_okay=False), default='.', show_default=True)
+@with_appcontext
+def export_command(tables, fmt, gzip, output_dir):
+    """Write TABLES (all of them by default) to OUTPUT_DIR, one file each."""
+    try:
+        check_format(fmt, gzip)
+    except APIException as error:
+        raise click.ClickException(error.message)
+    os.makedirs(output_dir, exist_ok=True)
+    for table in tables or EXPORT_MODELS:
+        path = os.path.join(output_dir, export_filename(table, fmt, gzip))
+        size = 0
+        with open(path, 'wb') as file:
+            for chunk in export_chunks(EXPORT_MODELS[table], fmt, gzip):
+                file.write(chunk)
+                size += len(chunk)
+        click.echo(f'{table}: {size} bytes written to {path}')
@@ -0,0 +1,279 @@
+"""
+Write paths for the fav_* link tables.
+
+Every change, single or batched, goes through `apply_favorite_changes`,
+which issues at most one INSERT and one DELETE per favorite type:
+
+- adds are an `INSERT ... SELECT <target>.id FROM <target> WHERE id IN (...)
+  ON CONFLICT DO NOTHING RETURNING`, guarded by an EXISTS check on the user,
+  so unknown targets and duplicates are skipped by the database itself;
+- removes are a `DELETE ... WHERE <target>_id IN (...) RETURNING`.
+
+The unique (user_id, <target>_id) index makes both safe under concurrent
+requests. Extra lookups only run for the items that were not written, to
+tell a missing row (404) from a duplicate or absent favorite.
+
+The targets' `favorite_count` is moved in the same transaction, by exactly
+the rows that were inserted or deleted. Favorites created or removed
+through the ORM (Flask-Admin) adjust it from mapper events, and
+`recount_favorites` rebuilds every counter from the link tables.
+"""
+import os
+from sqlalchemy import case, delete, event, exists, func, inspect, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from lookup import resolve_ids
+from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle
+
+ADD = 'add'
+REMOVE = 'remove'
+
+CREATED = 'created'
+DELETED = 'deleted'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+NOT_FAVORITE = 'not_favorite'
+SUPERSEDED = 'superseded'
+
+FAVORITES_BATCH_MAX = int(os.getenv('FAVORITES_BATCH_MAX', 500))
+
+# type name -> (link model, target model, link column pointing at the target)
+FAVORITE_TYPES = {
+    'character': (Fav_character, Character, 'character_id'),
+    'planet': (Fav_planet, Planet, 'planet_id'),
+    'vehicle': (Fav_vehicle, Vehicle, 'vehicle_id'),
+}
+
+
+def _insert(link_model):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(link_model), True
+    if dialect == 'sqlite':
+        return sqlite.insert(link_model), True
+    return insert(link_model), False
+
+
+def _linked_ids(kind, user_id, target_ids):
+    link_model, target_model, column = FAVORITE_TYPES[kind]
+    target_column = getattr(link_model, column)
+    stmt = select(target_column).where(link_model.user_id == user_id, target_column.in_(target_ids))
+    return set(db.session.execute(stmt).scalars())
+
+
+def _insert_many(kind, user_id, target_ids):
+    """Links the existing targets among `target_ids` and returns the ids actually inserted."""
+    link_model, target_model, column = FAVORITE_TYPES[kind]
+    target_column = getattr(link_model, column)
+    source = select(literal(user_id), target_model.id).where(
+        target_model.id.in_(target_ids),
+        exists().where(User.id == user_id),
+    )
+    stmt, supports_on_conflict = _insert(link_model)
+
+    if supports_on_conflict:
+        stmt = stmt.from_select(['user_id', column], source)
+        stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', column]).returning(target_column)
+        return set(db.session.execute(stmt).scalars())
+
+    # Dialects without ON CONFLICT: filter out current links up front
+    already_linked = _linked_ids(kind, user_id, target_ids)
+    source = source.where(target_model.id.not_in(already_linked))
+    db.session.execute(stmt.from_select(['user_id', column], source))
+    return _linked_ids(kind, user_id, target_ids) - already_linked
+
+
+def _delete_many(kind, user_id, target_ids):
+    """Unlinks `target_ids` and returns the ids that were actually linked."""
+    link_model, target_model, column = FAVORITE_TYPES[kind]
+    target_column = getattr(link_model, column)
+    stmt = delete(link_model).where(
+        link_model.user_id == user_id,
+        target_column.in_(target_ids),
+    ).returning(target_column)
+    return set(db.session.execute(stmt).scalars())
+
+
+def _count_update(target_model, target_ids, favorite_count):
+    # A counter change is not an edit of the item: keeping updated_at keeps
+    # the conditional GET validators and cached pages of the catalog valid
+    return update(target_model).where(target_model.id.in_(target_ids)).values(
+        favorite_count=favorite_count,
+        updated_at=target_model.updated_at,
+    ).execution_options(synchronize_session=False)
+
+
+def _adjust_counts(kind, added, removed):
+    """+1 for every target in `added`, -1 for every target in `removed`, in one UPDATE."""
+    if not added and not removed:
+        return
+    target_model = FAVORITE_TYPES[kind][1]
+    delta = case((target_model.id.in_(added), 1), else_=-1) if added and removed else (1 if added else -1)
+    db.session.execute(_count_update(target_model, added | removed, target_model.favorite_count + delta))
+
+
+def user_exists(user_id):
+    return db.session.execute(select(exists().where(User.id == user_id))).scalar()
+
+
+def favorite_ids(user_id, targets=None):
+    """
+    Returns {kind: sorted target ids} for the user's favorites, read from the
+    fav_* tables in one UNION ALL that their (user_id, <target>_id) indexes
+    answer without touching the table rows. `targets` ({kind: ids})
+    restricts the lookup to those types and ids.
+    """
+    kinds = list(FAVORITE_TYPES) if targets is None else list(targets)
+    selects = []
+    for kind in kinds:
+        link_model, target_model, column = FAVORITE_TYPES[kind]
+        target_column = getattr(link_model, column)
+        stmt = select(literal(kind).label('kind'), target_column.label('target_id')).where(link_model.user_id == user_id)
+        if targets is not None:
+            stmt = stmt.where(target_column.in_(targets[kind]))
+        selects.append(stmt)
+    found = {kind: [] for kind in kinds}
+    for kind, target_id in db.session.execute(selects[0] if len(selects) == 1 else union_all(*selects)):
+        found[kind].append(target_id)
+    for ids in found.values():
+        ids.sort()
+    return found
+
+
+def _existing_targets(kind, target_ids):
+    target_model = FAVORITE_TYPES[kind][1]
+    rows, _ = resolve_ids(target_model, list(target_ids), ['id'])
+    return {row.id for row in rows}
+
+
+def apply_favorite_changes(user_id, changes, user_checked=False):
+    """
+    Applies `(op, kind, target_id)` changes for one user in a single
+    transaction and returns one status per change, in order. When a
+    (kind, target_id) pair appears more than once, the last change wins
+    and the earlier ones are SUPERSEDED. `user_checked` skips the user
+    lookup for callers that already know the user exists.
+    """
+    # (kind, target_id) -> index of the change that wins
+    last = {(kind, target_id): index for index, (op, kind, target_id) in enumerate(changes)}
+    final = {pair: changes[index][0] for pair, index in last.items()}
+    written = {}
+    for kind in FAVORITE_TYPES:
+        adds = [target_id for (k, target_id), op in final.items() if k == kind and op == ADD]
+        removes = [target_id for (k, target_id), op in final.items() if k == kind and op == REMOVE]
+        if adds:
+            written[(kind, ADD)] = _insert_many(kind, user_id, adds)
+        if removes:
+            written[(kind, REMOVE)] = _delete_many(kind, user_id, removes)
+        _adjust_counts(kind, written.get((kind, ADD), set()), written.get((kind, REMOVE), set()))
+    db.session.commit()
+
+    # Only the changes that wrote nothing need to find out why
+    missed = {}
+    for (kind, target_id), op in final.items():
+        if target_id not in written[(kind, op)]:
+            missed.setdefault(kind, set()).add(target_id)
+    found_user = True
+    existing = {}
+    if missed:
+        found_user = user_checked or user_exists(user_id)
+        if found_user:
+            existing = {kind: _existing_targets(kind, ids) for kind, ids in missed.items()}
+
+    statuses = []
+    for index, (op, kind, target_id) in enumerate(changes):
+        if last[(kind, target_id)] != index:
+            statuses.append(SUPERSEDED)
+        elif target_id in written[(kind, op)]:
+            statuses.append(CREATED if op == ADD else DELETED)
+        elif not found_user or target_id not in existing[kind]:
+            statuses.append(NOT_FOUND)
+        else:
+            statuses.append(DUPLICATE if op == ADD else NOT_FAVORITE)
+    return statuses
+
+
+def add_favorite(kind, user_id, target_id):
+    """Links `target_id` to the user and returns one of CREATED, NOT_FOUND or DUPLICATE."""
+    return apply_favorite_changes(user_id, [(ADD, kind, target_id)])[0]
+
+
+def remove_favorite(kind, user_id, target_id):
+    """Unlinks `target_id` from the user and returns one of DELETED, NOT_FOUND or NOT_FAVORITE."""
+    return apply_favorite_changes(user_id, [(REMOVE, kind, target_id)])[0]
+
+
+def recount_favorites(kinds=None):
+    """
+    Recomputes `favorite_count` from the link tables, one UPDATE per type
+    touching only the rows that drifted. Returns {kind: rows fixed}.
+    """
+    fixed = {}
+    for kind in kinds or FAVORITE_TYPES:
+        link_model, target_model, column = FAVORITE_TYPES[kind]
+        actual = select(func.count()).where(getattr(link_model, column) == target_model.id).scalar_subquery()
+        stmt = update(target_model).where(target_model.favorite_count != actual).values(
+            favorite_count=actual,
+            updated_at=target_model.updated_at,
+        ).execution_options(synchronize_session=False)
+        fixed[kind] = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return fixed
+
+
+def _link_counter(kind):
+    link_model, target_model, column = FAVORITE_TYPES[kind]
+
+    def move(connection, target_id, delta):
+        if target_id is not None:
+            connection.execute(_count_update(target_model, [target_id], target_model.favorite_count + delta))
+
+    def after_insert(mapper, connection, link):
+        move(connection, getattr(link, column), 1)
+
+    def after_delete(mapper, connection, link):
+        move(connection, getattr(link, column), -1)
+
+    def after_update(mapper, connection, link):
+        history = inspect(link).attrs[column].history
+        if history.has_changes():
+            for target_id in history.deleted:
+                move(connection, target_id, -1)
+            for target_id in history.added:
+                move(connection, target_id, 1)
+
+    for name, listener in (('after_insert', after_insert), ('after_delete', after_delete),
+                           ('after_update', after_update)):
+        event.listen(link_model, name, listener)
+    # Loads the previous target before it is overwritten, or an expired link
+    # would reach after_update with no old value to decrement
+    event.listen(getattr(link_model, column), 'set', lambda link, value, old, initiator: value,
+                 retval=True, active_history=True)
+
+
+def register_favorite_counters():
+    """Keeps `favorite_count` right when link rows are written through the ORM (Flask-Admin)."""
+    for kind in FAVORITE_TYPES:
+        _link_counter(kind)
+
+
+def parse_favorite_changes(operations):
+    """
+    Validates `{op, type, id}` items and returns `(changes, errors)`, where
+    `changes` holds `(index, op, kind, target_id)` for the valid items and
+    `errors` maps the index of each invalid item to a message.
+    """
+    changes, errors = [], {}
+    for index, item in enumerate(operations):
+        if not isinstance(item, dict):
+            errors[index] = 'Each operation must be an object'
+            continue
+        op, kind, target_id = item.get('op'), item.get('type'), item.get('id')
+        if op not in (ADD, REMOVE):
+            errors[index] = f"op must be '{ADD}' or '{REMOVE}'"
+        elif kind not in FAVORITE_TYPES:
+            errors[index] = f"type must be one of {', '.join(FAVORITE_TYPES)}"
+        elif not isinstance(target_id, int) or isinstance(target_id, bool):
+            errors[index] = 'id must be an integer'
+        else:
+            changes.append((index, op, kind, target_id))
+    return changes, errors
@@ -0,0 +1,49 @@
+"""
+Sparse fieldsets: `?fields=id,name` selects only those columns.
+
+The requested names are validated against the model's `public_fields` and
+pushed down into the SELECT list, so unused columns are neither read from
+the database nor serialized.
+"""
+from flask import request
+from serializers import serialize_objects, serialize_tuples
+from utils import APIException
+
+
+def get_fields(model, args=None):
+    """Returns the requested field names, or None when `?fields=` is absent."""
+    raw = (request.args if args is None else args).get('fields')
+    if raw is None:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in model.public_fields]
+    if not fields or unknown:
+        raise APIException(
+            f"fields must be a comma separated list of: {', '.join(model.public_fields)}",
+            status_code=400,
+        )
+    # Drop repeated names but keep the order the client asked for
+    return list(dict.fromkeys(fields))
+
+
+def select_columns(model, fields, sort=None):
+    # The id (and sort column) always travel along: keyset pagination needs
+    # them to build the cursor
+    names = list(fields)
+    for name in ('id', sort[0] if sort else 'id'):
+        if name not in names:
+            names.append(name)
+    return [getattr(model, name) for name in names]
+
+
+def project(query, model, fields, sort=None):
+    if fields is None:
+        return query
+    return query.with_entities(*select_columns(model, fields, sort))
+
+
+def serialize_rows(model, rows, fields):
+    if fields is None:
+        return serialize_objects(model, rows)
+    # Projected rows start with the requested fields, in order
+    return serialize_tuples(model, rows, fields)
@@ -0,0 +1,107 @@
+"""
+Server-side filtering and name search for the catalog list endpoints.
+
+- `?<column>=value` for the model's `filter_fields` (exact match),
+- `?<column>_gte=` / `?<column>_lte=` for the model's `range_fields`,
+- `?q=` full-text search on `name`: the `<table>_fts` FTS5 table on SQLite
+  and the `to_tsvector('simple', name)` GIN index on PostgreSQL, both
+  created by migration 9f0c4e7d2a61. Databases without them (e.g. a dev
+  SQLite file made with `create_all`) fall back to a LIKE scan.
+
+Every filtered column is indexed, see the models' `__table_args__`.
+"""
+import re
+from flask import request
+from sqlalchemy import func, inspect, literal_column, select, text
+from sqlalchemy.exc import DBAPIError
+from models import db
+from utils import APIException
+
+_fts_tables = {}
+
+
+def _int_arg(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise APIException(f'{name} must be an integer', status_code=400)
+
+
+def has_fts_table(model, bind=None):
+    bind = db.session.get_bind() if bind is None else bind
+    key = (bind.engine.url, model.__tablename__)
+    if key not in _fts_tables:
+        _fts_tables[key] = inspect(bind).has_table(f'{model.__tablename__}_fts')
+    return _fts_tables[key]
+
+
+def probe_fts_tables(engines, *models):
+    """
+    Runs `has_fts_table` for every SQLite engine up front, at startup.
+    Returns the engines that could not be reached; they are looked up on
+    their first search instead.
+    """
+    unreachable = []
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+        try:
+            with engine.connect() as connection:
+                for model in models:
+                    has_fts_table(model, connection)
+        except DBAPIError:
+            unreachable.append(engine)
+    return unreachable
+
+
+def fts5_query(q):
+    # Quote every word so user input cannot inject FTS5 syntax and match it
+    # as a prefix, so "luke sky" finds "Luke Skywalker"
+    words = re.findall(r'\w+', q)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def search_clause(model, q, bind=None):
+    bind = db.session.get_bind() if bind is None else bind
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        document = func.to_tsvector(literal_column("'simple'"), model.name)
+        return document.bool_op('@@')(func.plainto_tsquery(literal_column("'simple'"), q))
+    if dialect == 'sqlite' and has_fts_table(model, bind):
+        match = fts5_query(q)
+        if not match:
+            return model.id.is_(None)
+        fts = f'{model.__tablename__}_fts'
+        matches = select(literal_column('rowid')).select_from(text(fts)).where(
+            text(f'{fts} MATCH :match').bindparams(match=match)
+        )
+        return model.id.in_(matches)
+    pattern = '%{}%'.format(q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    return model.name.ilike(pattern, escape='\\')
+
+
+def get_filters(model, args=None, bind=None):
+    """
+    Builds the WHERE clauses requested by the query string (`args`, the
+    current request's by default). `bind` defaults to the session's.
+    """
+    args = request.args if args is None else args
+    criteria = []
+    for name in getattr(model, 'filter_fields', ()):
+        value = args.get(name)
+        if value is not None:
+            criteria.append(getattr(model, name) == value)
+    for name in getattr(model, 'range_fields', ()):
+        column = getattr(model, name)
+        low, high = args.get(f'{name}_gte'), args.get(f'{name}_lte')
+        if low is not None:
+            criteria.append(column >= _int_arg(f'{name}_gte', low))
+        if high is not None:
+            criteria.append(column <= _int_arg(f'{name}_lte', high))
+    q = args.get('q')
+    # Only the catalog models have a name to search, ?q= is ignored on the
+    # others, as the users list does
+    if q and 'name' in model.__table__.c:
+        criteria.append(search_clause(model, q, bind))
+    return criteria
+
@@ -0,0 +1,55 @@
+"""
+Multi-get by primary key: `?ids=3,1,2` on the catalog list endpoints.
+
+All the ids are resolved with one `WHERE id IN (...)` query. Rows come back
+in the order they were asked for, and ids with no row are reported in
+`missing` instead of being dropped silently. At most API_IDS_MAX ids are
+accepted per request.
+"""
+import os
+from flask import request
+from sqlalchemy import select
+from fields import select_columns
+from models import db
+from utils import APIException
+
+IDS_MAX = int(os.getenv('API_IDS_MAX', 100))
+
+
+def get_ids(args=None, name='ids'):
+    """Reads `?<name>=1,2,3` from `args` (the current request's by default), None when absent."""
+    raw = (request.args if args is None else args).get(name)
+    if raw is None:
+        return None
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise APIException(f'{name} must be a comma separated list of integers', status_code=400)
+    if not ids:
+        raise APIException(f'{name} must be a comma separated list of integers', status_code=400)
+    # Repeated ids are answered once, where they first appear
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > IDS_MAX:
+        raise APIException(f'{name} can hold at most {IDS_MAX} values', status_code=400)
+    return ids
+
+
+def ids_statement(model, ids, fields=None):
+    columns = select_columns(model, fields) if fields is not None else [model]
+    return select(*columns).where(model.id.in_(ids))
+
+
+def order_by_ids(rows, ids):
+    """Returns (rows in the order of `ids`, ids that matched no row)."""
+    by_id = {row.id: row for row in rows}
+    return [by_id[id_] for id_ in ids if id_ in by_id], [id_ for id_ in ids if id_ not in by_id]
+
+
+def resolve_ids(model, ids, fields=None):
+    """
+    Loads the `model` rows for `ids` in one query. With `fields`, rows are
+    projected tuples as for `?fields=`; otherwise model instances.
+    """
+    result = db.session.execute(ids_statement(model, ids, fields))
+    rows = result.all() if fields is not None else result.scalars().all()
+    return order_by_ids(rows, ids)
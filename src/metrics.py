@@ -0,0 +1,165 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Per request: count, latency and response size, labelled by route, method
+and status, plus the number of SQL statements and the time spent in them
+(SQLAlchemy before/after_cursor_execute events). Per engine: how long
+checkouts waited for a pooled connection.
+
+Under gunicorn every worker keeps its own counters. With
+PROMETHEUS_MULTIPROC_DIR set to an empty, writable directory before the
+server starts (gunicorn.conf.py makes one when it is unset), each worker
+writes its values there and /metrics aggregates the files of all workers,
+whichever worker answers the scrape.
+
+Needs the `prometheus-client` package; without it requests are not
+instrumented and /metrics answers 501.
+"""
+import os
+import time
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 250)
+DB_TIME_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 5)
+WAIT_BUCKETS = (.0001, .001, .005, .01, .05, .1, .5, 1, 5, 30)
+
+REQUEST_LABELS = ('endpoint', 'method', 'status')
+
+if prometheus_client is not None:
+    REQUESTS = Counter('http_requests_total', 'HTTP requests', REQUEST_LABELS)
+    REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time to build and send the response',
+                                REQUEST_LABELS, buckets=LATENCY_BUCKETS)
+    RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size as sent (after compression)',
+                              REQUEST_LABELS, buckets=SIZE_BUCKETS)
+    REQUEST_STATEMENTS = Histogram('db_statements_per_request', 'SQL statements executed by one request',
+                                   REQUEST_LABELS, buckets=STATEMENT_BUCKETS)
+    REQUEST_DB_TIME = Histogram('db_time_per_request_seconds', 'Time one request spent executing SQL',
+                                REQUEST_LABELS, buckets=DB_TIME_BUCKETS)
+    POOL_CHECKOUT_WAIT = Histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+                                   ('bind',), buckets=WAIT_BUCKETS)
+
+
+def endpoint_label():
+    # The URL rule, not the path, so ids do not explode the label set
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+class RequestMetrics:
+    """What one request measured; observed when the response is done."""
+    __slots__ = ('start', 'statements', 'db_time', 'labels', 'size', 'deferred')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.labels = None
+        self.size = None
+        self.deferred = False
+
+    def observe(self):
+        labels = self.labels or (endpoint_label(), request.method, '500')
+        REQUESTS.labels(*labels).inc()
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - self.start)
+        if self.size is not None:
+            RESPONSE_SIZE.labels(*labels).observe(self.size)
+        REQUEST_STATEMENTS.labels(*labels).observe(self.statements)
+        REQUEST_DB_TIME.labels(*labels).observe(self.db_time)
+
+
+def start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def record_response(response):
+    metrics = g.get('request_metrics')
+    if metrics is None:
+        return response
+    metrics.labels = (endpoint_label(), request.method, str(response.status_code))
+    if response.is_streamed:
+        # The body (and its queries) is produced after teardown, observe
+        # once the server has sent it; streamed bodies have no length
+        metrics.deferred = True
+        response.call_on_close(metrics.observe)
+    else:
+        metrics.size = response.content_length
+    return response
+
+
+def end_request(error=None):
+    metrics = g.get('request_metrics')
+    if metrics is not None and not metrics.deferred:
+        metrics.observe()
+
+
+def instrument_engine(engine, bind):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        metrics = g.get('request_metrics') if has_app_context() else None
+        if metrics is not None:
+            metrics.statements += 1
+            metrics.db_time += elapsed
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_statement(context):
+        started = context.connection.info.get('metrics_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    @event.listens_for(engine, 'checkout')
+    def observe_checkout(dbapi_connection, connection_record, connection_proxy):
+        # Set by db_config.TimedQueuePool; other pool classes do not wait
+        wait = connection_record.info.pop('checkout_wait', None)
+        if wait is not None:
+            POOL_CHECKOUT_WAIT.labels(bind).observe(wait)
+
+
+def metrics_response():
+    """Body and headers for /metrics, or None when prometheus_client is missing."""
+    if prometheus_client is None:
+        return None
+    if MULTIPROC_DIR:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), {'Content-Type': prometheus_client.CONTENT_TYPE_LATEST}
+
+
+def mark_worker_dead(pid):
+    """For gunicorn's child_exit hook: drops the live values of a dead worker."""
+    if prometheus_client is not None and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def init_metrics(app, db):
+    """
+    Instruments the app and every engine of `db`. Call it before
+    init_compression so response sizes are measured after compression.
+    """
+    if prometheus_client is None:
+        app.logger.info('prometheus_client is not installed, metrics are disabled')
+        return
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(engine, bind or 'primary')
+
+    app.before_request(start_request)
+    app.after_request(record_response)
+    app.teardown_request(end_request)
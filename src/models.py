@@ -1,8 +1,17 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, ForeignKey, Integer
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, ForeignKey, Integer, Index, DateTime, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def utcnow():
+    # Naive UTC with microseconds, so two edits in the same second still
+    # produce different validators for conditional GETs
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
-db = SQLAlchemy()
 
 class User(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -17,6 +26,9 @@ class User(db.Model):
     favorite_planet: Mapped[list['Fav_planet']]= relationship(back_populates= 'user')
     favorite_vehicle: Mapped[list['Fav_vehicle']]= relationship(back_populates= 'user')
 
+    # Columns exposed by serialize(), also the ones clients may pick with ?fields=
+    public_fields = ('id', 'email', 'full_name', 'address', 'country')
+
 
     def serialize(self):
         return {
@@ -27,6 +39,16 @@ class User(db.Model):
             "country": self.country
             # do not serialize the password, its a security breach
         }
+    @classmethod
+    def favorites_options(cls):
+        # One SELECT per favorite type with the target joined in, so loading
+        # a user's favorites costs 4 queries no matter how many there are
+        return (
+            selectinload(cls.favorite_character).joinedload(Fav_character.character),
+            selectinload(cls.favorite_planet).joinedload(Fav_planet.planet),
+            selectinload(cls.favorite_vehicle).joinedload(Fav_vehicle.vehicle),
+        )
+
     def serialize_with_favorites(self):
         return {
             **self.serialize(), 
@@ -36,14 +58,31 @@ class User(db.Model):
         }
 
 class Character(db.Model):
+    __table_args__ = (
+        Index('ix_character_name', 'name', 'id'),
+        Index('ix_character_gender', 'gender'),
+        Index('ix_character_favorite_count', 'favorite_count', 'id'),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     height: Mapped[str] = mapped_column(String(120), nullable=False)
     gender: Mapped[str] = mapped_column(String(120), nullable=False)
     eye_color: Mapped[str] = mapped_column(String(120), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, server_default=text('CURRENT_TIMESTAMP'), index=True)
+    # Number of users with this item in their favorites, kept up to date by
+    # favorites.py; not part of the public payload
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
 
     favorite_by_links: Mapped[list['Fav_character']]= relationship(back_populates= 'character')
 
+    # Columns exposed by serialize(), also the ones clients may pick with ?fields=
+    public_fields = ('id', 'name', 'height', 'gender', 'eye_color')
+    # Indexed columns the list endpoint can filter (exact / _gte, _lte) and sort on
+    filter_fields = ('gender',)
+    range_fields = ()
+    sort_fields = ('id', 'name')
+
     def serialize(self):
         return {
             "id": self.id,
@@ -54,14 +93,32 @@ class Character(db.Model):
         }
     
 class Planet(db.Model):
+    __table_args__ = (
+        Index('ix_planet_name', 'name', 'id'),
+        Index('ix_planet_climate', 'climate'),
+        Index('ix_planet_population', 'population', 'id'),
+        Index('ix_planet_favorite_count', 'favorite_count', 'id'),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     climate: Mapped[str] = mapped_column(String(120), nullable=False)
     population: Mapped[int] = mapped_column(Integer, nullable=False)
     gravity: Mapped[str] = mapped_column(String(120), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, server_default=text('CURRENT_TIMESTAMP'), index=True)
+    # Number of users with this item in their favorites, kept up to date by
+    # favorites.py; not part of the public payload
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
 
     favorite_by_links: Mapped[list['Fav_planet']]= relationship(back_populates= 'planet')
 
+    # Columns exposed by serialize(), also the ones clients may pick with ?fields=
+    public_fields = ('id', 'name', 'climate', 'population', 'gravity')
+    # Indexed columns the list endpoint can filter (exact / _gte, _lte) and sort on
+    filter_fields = ('climate',)
+    range_fields = ('population',)
+    sort_fields = ('id', 'name', 'population')
+
     def serialize(self):
         return {
             "id": self.id,
@@ -72,15 +129,33 @@ class Planet(db.Model):
         }
 
 class Vehicle(db.Model):
+    __table_args__ = (
+        Index('ix_vehicle_name', 'name', 'id'),
+        Index('ix_vehicle_manufacturer', 'manufacturer'),
+        Index('ix_vehicle_max_speed', 'max_speed', 'id'),
+        Index('ix_vehicle_favorite_count', 'favorite_count', 'id'),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     model: Mapped[str] = mapped_column(String(120), nullable=False)
     manufacturer: Mapped[str] = mapped_column(String(120), nullable=False)
     passengers: Mapped[int] = mapped_column(Integer, nullable=False)
     max_speed: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, server_default=text('CURRENT_TIMESTAMP'), index=True)
+    # Number of users with this item in their favorites, kept up to date by
+    # favorites.py; not part of the public payload
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
 
     favorite_by_links: Mapped[list['Fav_vehicle']]= relationship(back_populates= 'vehicle')
 
+    # Columns exposed by serialize(), also the ones clients may pick with ?fields=
+    public_fields = ('id', 'name', 'model', 'manufacturer', 'passengers', 'max_speed')
+    # Indexed columns the list endpoint can filter (exact / _gte, _lte) and sort on
+    filter_fields = ('manufacturer',)
+    range_fields = ('max_speed',)
+    sort_fields = ('id', 'name', 'max_speed')
+
     def serialize(self):
         return {
             "id": self.id,
@@ -92,9 +167,11 @@ class Vehicle(db.Model):
         }
     
 class Fav_character(db.Model):
+    __table_args__ = (Index('ix_fav_character_user_id_character_id', 'user_id', 'character_id', unique=True),)
+
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
-    character_id: Mapped[int] = mapped_column(ForeignKey('character.id'))
+    character_id: Mapped[int] = mapped_column(ForeignKey('character.id'), index=True)
     user: Mapped['User'] = relationship(back_populates= 'favorite_character')
     character: Mapped['Character'] = relationship(back_populates= 'favorite_by_links')
 
@@ -102,9 +179,11 @@ class Fav_character(db.Model):
         return self.character.serialize()
 
 class Fav_planet(db.Model):
+    __table_args__ = (Index('ix_fav_planet_user_id_planet_id', 'user_id', 'planet_id', unique=True),)
+
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
-    planet_id: Mapped[int] = mapped_column(ForeignKey('planet.id'))
+    planet_id: Mapped[int] = mapped_column(ForeignKey('planet.id'), index=True)
     user: Mapped['User'] = relationship(back_populates= 'favorite_planet')
     planet: Mapped['Planet'] = relationship(back_populates= 'favorite_by_links')
 
@@ -112,9 +191,11 @@ class Fav_planet(db.Model):
         return self.planet.serialize()
     
 class Fav_vehicle(db.Model):
+    __table_args__ = (Index('ix_fav_vehicle_user_id_vehicle_id', 'user_id', 'vehicle_id', unique=True),)
+
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
-    vehicle_id: Mapped[int] = mapped_column(ForeignKey('vehicle.id'))
+    vehicle_id: Mapped[int] = mapped_column(ForeignKey('vehicle.id'), index=True)
     user: Mapped['User'] = relationship(back_populates= 'favorite_vehicle')
     vehicle: Mapped['Vehicle'] = relationship(back_populates= 'favorite_by_links')
 
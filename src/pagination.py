@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination helpers shared by the list endpoints.
+
+Pages are walked with `WHERE (sort_key, id) > (:last_key, :last_id) ORDER BY
+sort_key, id LIMIT :limit`, so the cost of a page does not depend on how deep
+into the table it is. The cursor is the opaque, base64 encoded sort key of
+the last row of the previous page.
+"""
+import base64
+import binascii
+import json
+import os
+from flask import request, url_for
+from sqlalchemy import func, select, tuple_
+from utils import APIException
+
+DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+
+# (column name, descending)
+DEFAULT_SORT = ('id', False)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# JSON types a sort key can hold
+CURSOR_VALUE_TYPES = (str, int, float, type(None))
+
+
+def decode_cursor(cursor, sort=DEFAULT_SORT):
+    """The sort key values in `cursor`, checked against the keys of `sort`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise APIException('Invalid cursor', status_code=400)
+    if not isinstance(values, list) or len(values) != sort_key_count(sort):
+        raise APIException('Invalid cursor', status_code=400)
+    # bool is an int too, but never a sort key
+    if any(type(value) not in CURSOR_VALUE_TYPES for value in values):
+        raise APIException('Invalid cursor', status_code=400)
+    return values
+
+
+def get_page_args(args=None, sort=DEFAULT_SORT):
+    """
+    Reads `?limit=` and `?cursor=` from `args`, the current request's by
+    default. The cursor must hold one value per key of `sort`.
+    """
+    args = request.args if args is None else args
+    limit = args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise APIException('limit must be an integer', status_code=400)
+    if limit < 1:
+        raise APIException('limit must be greater than 0', status_code=400)
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = args.get('cursor')
+    after = decode_cursor(cursor, sort) if cursor else None
+    return limit, after
+
+
+def get_sort(model, args=None):
+    """Reads `?sort=name` / `?sort=-name`, restricted to the model's `sort_fields`."""
+    raw = (request.args if args is None else args).get('sort')
+    if not raw:
+        return DEFAULT_SORT
+    descending = raw.startswith('-')
+    name = raw.lstrip('-')
+    sort_fields = getattr(model, 'sort_fields', DEFAULT_SORT[:1])
+    if name not in sort_fields:
+        raise APIException(
+            f"sort must be one of: {', '.join(sort_fields)} (prefix with - for descending)",
+            status_code=400,
+        )
+    return name, descending
+
+
+def sort_key_count(sort):
+    return 1 if sort[0] == 'id' else 2
+
+
+def sort_columns(model, sort):
+    name = sort[0]
+    # id breaks ties so every row has a unique position
+    return (model.id,) if name == 'id' else (getattr(model, name), model.id)
+
+
+def order_by_clauses(model, sort):
+    return [column.desc() if sort[1] else column for column in sort_columns(model, sort)]
+
+
+def keyset_criteria(model, after, sort=DEFAULT_SORT):
+    """WHERE clauses that start a page after the `after` cursor values."""
+    if after is None:
+        return []
+    columns = sort_columns(model, sort)
+    if len(after) != len(columns):
+        raise APIException('Invalid cursor', status_code=400)
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    boundary = tuple_(*after) if len(after) > 1 else after[0]
+    return [key < boundary if sort[1] else key > boundary]
+
+
+def split_page(items, model, limit, sort=DEFAULT_SORT):
+    """Cuts the `limit + 1` fetched rows down to one page and the next page's cursor."""
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_cursor([getattr(items[-1], column.key) for column in sort_columns(model, sort)])
+    return items, None
+
+
+def paginate(query, model, limit, after, sort=DEFAULT_SORT):
+    """Returns one page of `query` plus the cursor of the next page (or None)."""
+    query = query.filter(*keyset_criteria(model, after, sort))
+    # Fetch one extra row to know whether a next page exists without a COUNT
+    items = query.order_by(*order_by_clauses(model, sort)).limit(limit + 1).all()
+    return split_page(items, model, limit, sort)
+
+
+def next_link(next_cursor, limit):
+    if next_cursor is None:
+        return None
+    args = request.args.to_dict()
+    args.update(limit=limit, cursor=next_cursor)
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def wants_total_count(args=None):
+    return (request.args if args is None else args).get('count', '').lower() in ('1', 'true', 'yes')
+
+
+def count_statement(model, criteria=()):
+    # COUNT over the primary key or filter indexes
+    return select(func.count(model.id)).where(*criteria)
+
+
+def total_count(session, model, criteria=()):
+    """Row count for `X-Total-Count`."""
+    return session.execute(count_statement(model, criteria)).scalar_one()
+
+
+def page_headers(session, model, criteria=()):
+    if not wants_total_count():
+        return {}
+    return {'X-Total-Count': str(total_count(session, model, criteria))}
@@ -0,0 +1,172 @@
+"""
+Opt-in SQL statement tracking and per-route query budgets.
+
+With QUERY_TRACKING=1 every request counts the statements it executes and
+logs the total, plus every statement shape that ran more than once (the
+usual sign of an N+1 on a lazy relationship). Handlers declare what they
+are allowed to run with `@query_budget(n)`, placed right under
+`@app.route`; going over logs a warning, or raises QueryBudgetExceeded
+with QUERY_BUDGET_MODE=raise. With tracking off the decorator costs one
+attribute lookup.
+
+The same tracker works outside requests and in pytest:
+
+    with track_queries(budget=4) as tracker:
+        client.get('/users/1/favorites')
+
+    # tests/conftest.py provides it as the query_tracker fixture
+    def test_favorites(client, query_tracker):
+        with query_tracker(budget=4):
+            client.get('/users/1/favorites')
+
+Statements sent to the DBAPI directly (pragmas, pool pings) are not seen.
+The bodies of streamed responses run their queries after the request has
+been logged and are not counted.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_TRACKING = os.getenv('QUERY_TRACKING', '0').lower() in ('1', 'true', 'yes', 'on')
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn')
+# Repeated shapes listed in log lines and errors
+REPORTED_SHAPES = 5
+
+PLACEHOLDER = re.compile(r'%\(\w+\)s|\$\d+|:\w+')
+PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def statement_shape(statement):
+    """The statement with placeholders and expanded IN lists collapsed."""
+    shape = PLACEHOLDER.sub('?', statement)
+    shape = PLACEHOLDER_LIST.sub('?, ...', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryTracker:
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.shapes = Counter()
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+    def record(self, statement):
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self):
+        return [(shape, times) for shape, times in self.shapes.most_common(REPORTED_SHAPES) if times > 1]
+
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def report(self, label):
+        lines = [f'{label} ran {self.count} SQL statements'
+                 + (f', budget is {self.budget}' if self.budget is not None else '')]
+        lines += [f'  {times}x {shape}' for shape, times in self.repeated()]
+        return '\n'.join(lines)
+
+    def check(self, label='block'):
+        if self.over_budget():
+            raise QueryBudgetExceeded(self.report(label))
+
+
+# Trackers opened with track_queries(), per thread
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _active_trackers():
+    if not hasattr(_local, 'trackers'):
+        _local.trackers = []
+    return _local.trackers
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for tracker in _active_trackers():
+        tracker.record(statement)
+    if has_app_context():
+        tracker = g.get('query_tracker')
+        if tracker is not None:
+            tracker.record(statement)
+
+
+def install():
+    """Listens on every engine; idempotent."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _record_statement)
+            _installed = True
+
+
+@contextmanager
+def track_queries(budget=None):
+    """Counts the statements run in this thread inside the block; raises when over `budget`."""
+    install()
+    tracker = QueryTracker(budget)
+    _active_trackers().append(tracker)
+    try:
+        yield tracker
+    finally:
+        _active_trackers().remove(tracker)
+    tracker.check()
+
+
+def query_budget(budget):
+    """Declares how many statements a handler may run."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tracker = g.get('query_tracker')
+            if tracker is None:
+                return view(*args, **kwargs)
+            tracker.budget = budget
+            response = view(*args, **kwargs)
+            if tracker.over_budget():
+                report = tracker.report(f'{request.method} {request.path}')
+                if QUERY_BUDGET_MODE == 'raise':
+                    raise QueryBudgetExceeded(report)
+                current_app.logger.warning(report)
+            return response
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
+
+
+def start_tracking():
+    g.query_tracker = QueryTracker()
+
+
+def log_queries(error=None):
+    tracker = g.get('query_tracker')
+    if tracker is None or not tracker.count:
+        return
+    label = f'{request.method} {request.path}'
+    if tracker.repeated():
+        current_app.logger.warning(tracker.report(label))
+    else:
+        current_app.logger.info(tracker.report(label))
+
+
+def init_query_tracking(app):
+    if not QUERY_TRACKING:
+        return
+    install()
+    app.before_request(start_tracking)
+    app.teardown_request(log_queries)
+    app.logger.info('Query tracking is on, budgets %s', 'raise' if QUERY_BUDGET_MODE == 'raise' else 'warn')
+
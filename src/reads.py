@@ -0,0 +1,44 @@
+"""
+ORM-free read path for the catalog list and detail routes (API_CORE_READS=1).
+
+Rows are fetched with a Core `select()` of the mapped table's columns and
+handed to the compiled row serializers as plain `Row` tuples: no mapped
+instances, identity map entries or attribute state are built for data
+that is only turned back into dicts. Without `?fields=` the selected
+columns are the model's `public_fields`, so the payload is the same as
+`serialize()`. Writes and Flask-Admin keep using the ORM.
+
+    API_CORE_READS
+"""
+import os
+from sqlalchemy import select
+from fields import select_columns
+from models import db
+from pagination import keyset_criteria, order_by_clauses, split_page
+from serializers import serialize_tuples
+
+CORE_READS = os.getenv('API_CORE_READS', '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def table_columns(model, fields, sort=None):
+    table = model.__table__
+    return [table.c[column.key] for column in select_columns(model, fields or model.public_fields, sort)]
+
+
+def read_page(model, fields, sort, criteria, limit, after):
+    """One keyset page as (serialized rows, next cursor), the Core twin of `paginate`."""
+    table = model.__table__
+    # The table's column collection stands in for the model: sort and cursor
+    # columns are then looked up on the table, not on the mapper
+    stmt = select(*table_columns(model, fields, sort)).where(
+        *criteria, *keyset_criteria(table.c, after, sort)
+    ).order_by(*order_by_clauses(table.c, sort)).limit(limit + 1)
+    rows, next_cursor = split_page(db.session.execute(stmt).all(), table.c, limit, sort)
+    return serialize_tuples(model, rows, fields), next_cursor
+
+
+def read_one(model, id_, fields):
+    """The serialized row with this id, or None."""
+    table = model.__table__
+    row = db.session.execute(select(*table_columns(model, fields)).where(table.c.id == id_)).first()
+    return serialize_tuples(model, [row], fields)[0] if row is not None else None
@@ -0,0 +1,148 @@
+"""
+Read-replica routing.
+
+`DATABASE_REPLICA_URLS` (comma separated) registers one Flask-SQLAlchemy
+bind per replica (`replica_0`, `replica_1`, ...). GET handlers marked with
+`@replica_read` run their SELECTs on a replica picked round-robin; writes,
+flushes and every other handler stay on the primary.
+
+Read-your-writes: a successful write response sets a short-lived
+`read_primary` cookie (REPLICA_STICKY_SECONDS), and clients can also send
+`X-Read-Primary: 1`, so the GET following a favorite POST sees the change.
+
+A replica whose connection fails is taken out of rotation for
+REPLICA_RETRY_SECONDS and the request moves on to the next replica, or to
+the primary when none is left.
+"""
+import itertools
+import os
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', 30))
+
+READ_PRIMARY_COOKIE = 'read_primary'
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPool:
+    def __init__(self):
+        self.keys = []
+        self._cycle = None
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def configure(self, keys):
+        self.keys = list(keys)
+        self._cycle = itertools.cycle(self.keys)
+        self._down_until.clear()
+
+    def mark_down(self, key):
+        with self._lock:
+            self._down_until[key] = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    def healthy(self, key):
+        return self._down_until.get(key, 0) <= time.monotonic()
+
+    def choose(self):
+        """Next healthy replica bind key, or None to use the primary."""
+        with self._lock:
+            for _ in range(len(self.keys)):
+                key = next(self._cycle)
+                if self.healthy(key):
+                    return key
+        return None
+
+    def status(self):
+        return {key: self.healthy(key) for key in self.keys}
+
+
+replica_pool = ReplicaPool()
+
+
+def replica_binds(urls):
+    """Turns DATABASE_REPLICA_URLS into SQLALCHEMY_BINDS entries."""
+    urls = [url.strip().replace('postgres://', 'postgresql://') for url in (urls or '').split(',') if url.strip()]
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
+
+def current_replica():
+    if not has_app_context():
+        return None
+    return g.get('db_replica')
+
+
+class RoutingSession(Session):
+    """Sends the SELECTs of replica-routed requests to the chosen replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = current_replica()
+        if replica is not None and bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def wants_primary():
+    if request.headers.get(READ_PRIMARY_HEADER, '').lower() in ('1', 'true', 'yes'):
+        return True
+    return READ_PRIMARY_COOKIE in request.cookies
+
+
+def connect_replica():
+    """
+    Checks out a connection from the next healthy replica and returns its
+    bind key. The session keeps that connection for the rest of the
+    request, so the check costs no extra round trip.
+    """
+    db = current_app.extensions['sqlalchemy']
+    while True:
+        key = replica_pool.choose()
+        if key is None:
+            return None
+        try:
+            db.session.connection(bind_arguments={'bind': db.engines[key]})
+            return key
+        except DBAPIError:
+            db.session.rollback()
+            replica_pool.mark_down(key)
+            current_app.logger.warning('Replica %s is unavailable, taking it out of rotation', key)
+
+
+def replica_read(view):
+    """Marks a read-only GET handler as safe to serve from a replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in SAFE_METHODS and replica_pool.keys and not wants_primary():
+            g.db_replica = connect_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_replicas(app, db):
+    """Watches replica engines for connection errors and sets the read-your-writes cookie."""
+    keys = [key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('replica_')]
+    replica_pool.configure(keys)
+    if not keys:
+        return
+
+    with app.app_context():
+        for key in keys:
+            engine = db.engines[key]
+
+            @event.listens_for(engine, 'handle_error')
+            def take_out_of_rotation(context, key=key):
+                if context.is_disconnect or context.connection is None:
+                    replica_pool.mark_down(key)
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(READ_PRIMARY_COOKIE, '1', max_age=REPLICA_STICKY_SECONDS, httponly=True)
+        return response
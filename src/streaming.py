@@ -0,0 +1,93 @@
+"""
+"Give me everything" mode for the list endpoints.
+
+`?stream=1` returns the usual `{"msg": "ok", "results": [...]}` document and
+`?stream=ndjson` returns one JSON object per line. Rows are read from the
+database in `yield_per` batches (server-side cursors on PostgreSQL) and
+encoded as they arrive, so worker memory stays flat whatever the table size.
+The filters, `?q=`, `?sort=` and `?fields=` apply as usual; `?ids=`,
+`?limit=` and `?cursor=` pick a part of the table and are refused.
+"""
+import os
+from functools import wraps
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+from fields import get_fields, select_columns, serialize_rows
+from filtering import get_filters
+from pagination import get_sort, order_by_clauses
+from reads import CORE_READS, table_columns
+from serializers import serialize_tuples
+from utils import APIException
+from models import db
+
+STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', 1000))
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Arguments of the paged and multi-get reads that a stream would ignore
+PAGE_ARGS = ('ids', 'limit', 'cursor')
+
+
+def stream_format():
+    value = request.args.get('stream', '').lower()
+    if value in ('1', 'true', 'yes', 'json'):
+        return 'json'
+    if value == 'ndjson':
+        return 'ndjson'
+    return None
+
+
+def iter_items(model, fields, sort, criteria):
+    """Yields serialized rows, reading the table in `yield_per` batches."""
+    if CORE_READS:
+        columns = table_columns(model, fields)
+    else:
+        columns = [model] if fields is None else select_columns(model, fields)
+    stmt = select(*columns).where(*criteria).order_by(*order_by_clauses(model, sort))
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+    if fields is None and not CORE_READS:
+        result = result.scalars()
+    for batch in result.partitions():
+        yield from serialize_tuples(model, batch, fields) if CORE_READS else serialize_rows(model, batch, fields)
+
+
+def iter_json(model, *query_args):
+    dumps = current_app.json.dumps
+    yield '{"msg": "ok", "results": ['
+    separator = ''
+    for item in iter_items(model, *query_args):
+        yield separator + dumps(item)
+        separator = ', '
+    yield ']}'
+
+
+def iter_ndjson(model, *query_args):
+    dumps = current_app.json.dumps
+    for item in iter_items(model, *query_args):
+        yield dumps(item) + '\n'
+
+
+def stream_response(model, fmt):
+    combined = [name for name in PAGE_ARGS if name in request.args]
+    if combined:
+        raise APIException(f"stream returns the whole table and cannot be combined with {', '.join(combined)}",
+                           status_code=400)
+    query_args = (get_fields(model), get_sort(model), get_filters(model))
+    # The query runs inside the generator so it uses the session that lives
+    # for as long as the streamed body, not the one torn down with the view
+    if fmt == 'ndjson':
+        return Response(stream_with_context(iter_ndjson(model, *query_args)), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(iter_json(model, *query_args)), mimetype='application/json')
+
+
+def streamable(model):
+    """Serves the whole table as a streamed response when `?stream=` is set."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            fmt = stream_format()
+            if fmt is None:
+                return view(*args, **kwargs)
+            return stream_response(model, fmt)
+        return wrapper
+    return decorator
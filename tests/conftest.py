@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+from itertools import count
+import pytest
+
+# The app modules import each other by their flat names, as under `flask run`
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# Read when app.py is imported. Always replaced, so a DATABASE_URL loaded
+# from .env (pipenv run pytest) never sees the fixtures' rows: a throwaway
+# SQLite file per test session unless TEST_DATABASE_URL names another one
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or \
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from query_budget import track_queries  # noqa: E402
+from models import db, User, Character, Planet, Vehicle, Fav_character, Fav_planet, Fav_vehicle  # noqa: E402
+
+# Keeps user emails unique across the session's tests
+_user_numbers = count()
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    with flask_app.app_context():
+        # Only the primary: test_replicas.py registers replica binds on the
+        # shared extension for its own apps
+        db.create_all(bind_key=None)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_tracker():
+    """`track_queries` as a fixture: `with query_tracker(budget=n): ...` fails the test when exceeded."""
+    return track_queries
+
+
+@pytest.fixture
+def make_user(app):
+    """Creates a user with `favorites` characters, planets and vehicles in its favorites; returns the user id."""
+    def make(favorites=0):
+        number = next(_user_numbers)
+        with app.app_context():
+            user = User(email=f'user{number}@example.com', password='secret', is_active=True,
+                        full_name=f'User {number}', address='Somewhere', country='Tatooine')
+            for index in range(favorites):
+                user.favorite_character.append(Fav_character(character=Character(
+                    name=f'Character {index}', height='172', gender='male', eye_color='blue')))
+                user.favorite_planet.append(Fav_planet(planet=Planet(
+                    name=f'Planet {index}', climate='arid', population=200000, gravity='1 standard')))
+                user.favorite_vehicle.append(Fav_vehicle(vehicle=Vehicle(
+                    name=f'Vehicle {index}', model='T-16', manufacturer='Incom', passengers=1, max_speed=1200)))
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def make_characters(app):
+    """Creates `count` characters with `gender` (handy as a filter that only matches them); returns their ids."""
+    def make(count, gender='male'):
+        with app.app_context():
+            characters = [Character(name=f'Character {index}', height='172', gender=gender, eye_color='blue')
+                          for index in range(count)]
+            db.session.add_all(characters)
+            db.session.commit()
+            return [character.id for character in characters]
+    return make
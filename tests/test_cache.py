@@ -0,0 +1,42 @@
+from cache import response_cache
+from models import db, Character
+
+
+def test_repeated_get_is_served_from_the_cache(client, make_characters):
+    make_characters(2, gender='cached')
+    path = '/characters?gender=cached'
+
+    first = client.get(path)
+    hits = response_cache.stats()['hits']
+    second = client.get(path)
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert response_cache.stats()['hits'] == hits + 1
+
+
+def test_orm_commit_evicts_the_table(app, client, make_characters):
+    character_id, = make_characters(1, gender='evicted')
+    path = '/characters?gender=evicted'
+    client.get(path)
+
+    with app.app_context():
+        db.session.get(Character, character_id).name = 'Renamed'
+        db.session.commit()
+
+    assert client.get(path).get_json()['results'][0]['name'] == 'Renamed'
+
+
+def test_errors_are_not_cached(client):
+    path = '/characters?gender=nobody'
+    entries = response_cache.stats()['entries']
+
+    assert client.get(path).status_code == 400
+    assert response_cache.stats()['entries'] == entries
+
+
+def test_cache_stats(client):
+    response = client.get('/cache/stats')
+
+    assert response.status_code == 200
+    assert {'hits', 'misses', 'evictions', 'entries', 'max_entries', 'ttl'} <= set(response.get_json())
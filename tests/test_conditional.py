@@ -0,0 +1,56 @@
+import pytest
+from models import db, utcnow, Character
+
+
+def edit_elsewhere(app, character_id, name):
+    # A Core statement fires no ORM events, like an edit made by another
+    # worker, raw SQL or `flask catalog import`
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(Character.__table__.update().where(Character.__table__.c.id == character_id)
+                           .values(name=name, updated_at=utcnow()))
+
+
+@pytest.mark.parametrize('detail', [False, True])
+def test_matching_etag_is_a_304(client, make_characters, detail):
+    character_id, = make_characters(1, gender=f'etag {detail}')
+    path = f'/characters/{character_id}' if detail else f'/characters?gender=etag+{detail}'
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['ETag'] and response.headers['Last-Modified']
+
+    revalidated = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+
+
+@pytest.mark.parametrize('detail', [False, True])
+def test_edit_outside_the_process_is_not_served_stale(app, client, make_characters, detail):
+    character_id, = make_characters(1, gender=f'elsewhere {detail}')
+    path = f'/characters/{character_id}' if detail else f'/characters?gender=elsewhere+{detail}'
+    before = client.get(path)
+    client.get(path)
+
+    edit_elsewhere(app, character_id, 'Edited elsewhere')
+    after = client.get(path)
+
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert b'Edited elsewhere' in after.get_data()
+    assert client.get(path, headers={'If-None-Match': before.headers['ETag']}).status_code == 200
+
+
+def test_304_keeps_the_compressed_etag_and_vary(client, make_characters):
+    # Enough rows to be over COMPRESS_MIN_SIZE
+    make_characters(30, gender='gzipped')
+    path = '/characters?gender=gzipped'
+    headers = {'Accept-Encoding': 'gzip'}
+
+    response = client.get(path, headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+
+    revalidated = client.get(path, headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+    assert 'Accept-Encoding' in revalidated.headers['Vary']
@@ -0,0 +1,143 @@
+import pytest
+
+
+@pytest.mark.parametrize('favorites', [0, 10, 100])
+def test_favorites_query_count_does_not_grow(client, make_user, query_tracker, favorites):
+    user_id = make_user(favorites)
+
+    # The user, then one SELECT per favorite type with its target joined in
+    with query_tracker(budget=4) as tracker:
+        response = client.get(f'/users/{user_id}/favorites')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    for key in ('favorite_character', 'favorite_planet', 'favorite_vehicle'):
+        assert len(body[key]) == favorites
+    assert tracker.count == 4
+
+
+def test_favorites_unknown_user(client):
+    response = client.get('/users/999999/favorites')
+
+    assert response.status_code == 404
+    assert response.get_json() == {'msg': 'No user found'}
+
+
+def test_batch_reports_a_status_per_operation(client, make_user, make_characters):
+    user_id = make_user()
+    character_id, other_id = make_characters(2)
+    client.post(f'/users/{user_id}/favorite/character/{other_id}')
+
+    response = client.post(f'/users/{user_id}/favorites:batch', json=[
+        {'op': 'add', 'type': 'character', 'id': character_id},
+        {'op': 'add', 'type': 'character', 'id': character_id},
+        {'op': 'add', 'type': 'character', 'id': other_id},
+        {'op': 'remove', 'type': 'character', 'id': 999999},
+        {'op': 'add', 'type': 'spaceship', 'id': 1},
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [(result['status'], result.get('result')) for result in results] == [
+        (200, 'superseded'),
+        (201, 'created'),
+        (409, 'duplicate'),
+        (404, 'not_found'),
+        (400, None),
+    ]
+
+
+def test_batch_unknown_user(client):
+    response = client.post('/users/999999/favorites:batch', json=[{'op': 'add', 'type': 'planet', 'id': 1}])
+
+    assert response.status_code == 404
+
+
+def test_batch_error_body_is_json(client, make_user, monkeypatch):
+    import app as app_module
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app_module, 'apply_favorite_changes', fail)
+
+    response = client.post(f'/users/{make_user()}/favorites:batch', json=[{'op': 'add', 'type': 'planet', 'id': 1}])
+
+    assert response.status_code == 500
+    assert response.get_json() == {'msg': 'Internal Server Error', 'error': 'boom'}
+
+
+@pytest.mark.parametrize('kind', ['character', 'planet', 'vehicle'])
+def test_add_and_remove_one_favorite(client, make_user, kind):
+    user_id = make_user(1)
+    target_id = client.get(f'/users/{user_id}/favorites/ids').get_json()[kind][0]
+    path = f'/users/{user_id}/favorite/{kind}/{target_id}'
+
+    assert client.post(path).status_code == 409
+    assert client.delete(path).status_code == 200
+    response = client.delete(path)
+    assert response.status_code == 404
+    assert response.get_json() == {'msg': f'Favorite {kind} not found'}
+    response = client.post(path)
+    assert response.status_code == 201
+    assert response.get_json()['id'] == target_id
+
+
+@pytest.mark.parametrize('method', ['POST', 'DELETE'])
+@pytest.mark.parametrize('kind', ['character', 'planet', 'vehicle'])
+def test_favorite_unknown_user_or_target(client, make_user, method, kind):
+    user_id = make_user(1)
+    target_id = client.get(f'/users/{user_id}/favorites/ids').get_json()[kind][0]
+
+    for path in (f'/users/999999/favorite/{kind}/{target_id}', f'/users/{user_id}/favorite/{kind}/999999'):
+        response = client.open(path, method=method)
+        assert response.status_code == 404
+        assert response.get_json() == {'msg': f'user or {kind} not found'}
+
+
+def test_favorite_error_body_is_json(client, make_user, monkeypatch):
+    import app as app_module
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app_module, 'add_favorite', fail)
+
+    response = client.post(f'/users/{make_user()}/favorite/planet/1')
+
+    assert response.status_code == 500
+    assert response.get_json() == {'msg': 'Internal Server Error', 'error': 'boom'}
+
+
+def test_favorite_ids_and_contains(client, make_user):
+    user_id = make_user(2)
+    ids = client.get(f'/users/{user_id}/favorites/ids').get_json()
+    planet, other = ids['planet']
+
+    response = client.get(f'/users/{user_id}/favorites/contains?planet={planet},999999&vehicle={ids["vehicle"][0]}')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'msg': 'ok', 'planet': {str(planet): True, '999999': False},
+                                   'vehicle': {str(ids['vehicle'][0]): True}}
+
+
+def test_favorite_ids_unknown_user(client):
+    assert client.get('/users/999999/favorites/ids').status_code == 404
+    assert client.get('/users/999999/favorites/contains?planet=1').status_code == 404
+
+
+def test_favorite_contains_bad_ids(client, make_user):
+    response = client.get(f'/users/{make_user()}/favorites/contains?planet=a')
+
+    assert response.status_code == 400
+
+
+def test_favorite_ids_error_body_is_json(client, make_user, monkeypatch):
+    import app as app_module
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app_module, 'favorite_ids', fail)
+
+    for path in ('ids', 'contains?planet=1'):
+        response = client.get(f'/users/{make_user()}/favorites/{path}')
+        assert response.status_code == 500
+        assert response.get_json() == {'msg': 'Internal server error', 'error': 'boom'}
@@ -0,0 +1,16 @@
+def test_search_finds_by_name_prefix(client, make_characters):
+    make_characters(2, gender='search')
+
+    response = client.get('/characters?gender=search&q=chara')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 2
+
+
+def test_search_is_ignored_on_users(client, make_user):
+    make_user()
+
+    for path in ('/users?q=x', '/users?stream=1&q=x', '/users?stream=ndjson&q=x'):
+        response = client.get(path)
+        response.get_data()
+        assert response.status_code == 200, path
@@ -0,0 +1,48 @@
+import base64
+import json
+import pytest
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('sort', ['id', 'name', '-name'])
+def test_cursor_walks_every_row_once(client, make_characters, sort):
+    ids = make_characters(7, gender=f'walk {sort}')
+
+    seen = []
+    path = f'/characters?gender=walk+{sort}&sort={sort}&limit=3&fields=id'
+    while path:
+        response = client.get(path)
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [row['id'] for row in body['results']]
+        path = body['next']
+
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(ids)
+
+
+@pytest.mark.parametrize('sort, value', [
+    ('name', cursor([5])),
+    ('id', cursor([5, 6])),
+    ('name', cursor([{'a': 1}, 1])),
+    ('id', cursor([{'a': 1}])),
+    ('id', cursor([True])),
+    ('id', cursor({'id': 5})),
+    ('id', 'not-base64!'),
+])
+def test_malformed_cursor_is_a_400(client, make_characters, sort, value):
+    make_characters(1)
+
+    response = client.get(f'/characters?sort={sort}&cursor={value}')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'Invalid cursor'}
+
+
+def test_limit_must_be_positive(client):
+    response = client.get('/characters?limit=0')
+
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+def test_popular_ranks_by_favorite_count(client, make_user, make_characters):
+    rare, common = make_characters(2, gender='popular')
+    for target, users in ((rare, 1), (common, 3)):
+        for _ in range(users):
+            assert client.post(f'/users/{make_user()}/favorite/character/{target}').status_code == 201
+
+    response = client.get('/characters/popular?limit=500')
+
+    assert response.status_code == 200
+    ranking = [row['id'] for row in response.get_json()['results']]
+    assert ranking.index(common) < ranking.index(rare)
+    counts = {row['id']: row['favorite_count'] for row in response.get_json()['results']}
+    assert counts[common] == 3 and counts[rare] == 1
+
+
+def test_popular_error_body_is_json(client, monkeypatch):
+    import app as app_module
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app_module, 'paginate', fail)
+
+    response = client.get('/planets/popular')
+
+    assert response.status_code == 500
+    assert response.get_json() == {'msg': 'Internal server error', 'error': 'boom'}
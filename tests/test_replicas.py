@@ -0,0 +1,135 @@
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import insert, select
+from models import db, Character
+from replicas import READ_PRIMARY_COOKIE, READ_PRIMARY_HEADER, replica_binds, replica_pool, replica_read, \
+    init_replicas
+
+
+def add_character(engine, name):
+    with engine.begin() as connection:
+        connection.execute(insert(Character.__table__).values(
+            name=name, height='1', gender='replica test', eye_color='-'))
+
+
+def make_app(tmp_path, replica_urls):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path}/primary.db'
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(','.join(replica_urls))
+    db.init_app(app)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            # Replicas of the same schema; each file says where a read landed
+            if key is None or not engine.url.database.startswith('/nonexistent'):
+                db.metadata.create_all(engine, tables=[Character.__table__])
+                add_character(engine, 'primary' if key is None else key)
+    init_replicas(app, db)
+
+    def names():
+        return [name for name, in db.session.execute(
+            select(Character.name).where(Character.gender == 'replica test').order_by(Character.id))]
+
+    @app.route('/read')
+    @replica_read
+    def read():
+        return jsonify(names())
+
+    @app.route('/unrouted')
+    def unrouted():
+        return jsonify(names())
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        db.session.add(Character(name='written', height='1', gender='replica test', eye_color='-'))
+        db.session.commit()
+        return jsonify(names()), 201
+
+    @app.route('/read-then-write')
+    @replica_read
+    def read_then_write():
+        before = names()
+        db.session.add(Character(name='written from a read', height='1', gender='replica test', eye_color='-'))
+        db.session.commit()
+        return jsonify(before)
+
+    return app
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    apps = []
+
+    def make(*replica_urls):
+        apps.append(make_app(tmp_path, [url.format(tmp=tmp_path) for url in replica_urls]))
+        return apps[-1]
+    yield make
+    # The pool is module state; give it back to the app under test
+    replica_pool.configure([])
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def primary_names(app):
+    with app.app_context():
+        return [name for name, in db.session.execute(
+            select(Character.name).where(Character.gender == 'replica test').order_by(Character.id))]
+
+
+def test_reads_go_to_the_replica(replica_app):
+    client = replica_app('sqlite:///{tmp}/replica.db').test_client()
+
+    assert client.get('/read').get_json() == ['replica_0']
+    assert client.get('/unrouted').get_json() == ['primary']
+
+
+def test_replicas_take_turns(replica_app):
+    client = replica_app('sqlite:///{tmp}/r0.db', 'sqlite:///{tmp}/r1.db').test_client()
+
+    seen = {tuple(client.get('/read').get_json()) for _ in range(4)}
+
+    assert seen == {('replica_0',), ('replica_1',)}
+
+
+def test_writes_and_the_reads_after_them_use_the_primary(replica_app):
+    app = replica_app('sqlite:///{tmp}/replica.db')
+    client = app.test_client()
+
+    response = client.post('/write')
+    assert response.status_code == 201
+    assert response.get_json() == ['primary', 'written']
+    assert READ_PRIMARY_COOKIE in response.headers['Set-Cookie']
+
+    # The cookie sends the next read to the primary, which has the write
+    assert client.get('/read').get_json() == ['primary', 'written']
+    client.delete_cookie(READ_PRIMARY_COOKIE)
+    assert client.get('/read').get_json() == ['replica_0']
+
+
+def test_read_primary_header(replica_app):
+    client = replica_app('sqlite:///{tmp}/replica.db').test_client()
+
+    assert client.get('/read', headers={READ_PRIMARY_HEADER: '1'}).get_json() == ['primary']
+
+
+def test_flush_in_a_routed_request_goes_to_the_primary(replica_app):
+    app = replica_app('sqlite:///{tmp}/replica.db')
+
+    assert app.test_client().get('/read-then-write').get_json() == ['replica_0']
+    assert primary_names(app) == ['primary', 'written from a read']
+
+
+def test_failed_replica_is_skipped(replica_app):
+    app = replica_app('sqlite:////nonexistent/dir/r0.db', 'sqlite:///{tmp}/r1.db')
+    client = app.test_client()
+
+    assert [client.get('/read').get_json() for _ in range(3)] == [['replica_1']] * 3
+    assert replica_pool.status() == {'replica_0': False, 'replica_1': True}
+
+
+def test_primary_is_used_when_every_replica_is_down(replica_app):
+    client = replica_app('sqlite:////nonexistent/dir/r0.db').test_client()
+
+    assert client.get('/read').get_json() == ['primary']
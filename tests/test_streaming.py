@@ -0,0 +1,22 @@
+import json
+import pytest
+
+
+def test_stream_returns_every_matching_row(client, make_characters):
+    ids = make_characters(5, gender='streamed')
+
+    json_body = client.get('/characters?stream=1&gender=streamed').get_json()
+    ndjson_body = client.get('/characters?stream=ndjson&gender=streamed').get_data(as_text=True)
+
+    assert [row['id'] for row in json_body['results']] == ids
+    assert [json.loads(line)['id'] for line in ndjson_body.splitlines()] == ids
+
+
+@pytest.mark.parametrize('args', ['ids=1,2', 'limit=2', 'cursor=WzFd', 'ids=1&limit=2'])
+def test_stream_refuses_page_arguments(client, make_characters, args):
+    make_characters(1)
+
+    response = client.get(f'/characters?stream=1&{args}')
+
+    assert response.status_code == 400
+    assert 'cannot be combined' in response.get_json()['message']